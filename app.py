@@ -1,18 +1,39 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, abort, jsonify, Response
+from flask import Flask, render_template, request, redirect, url_for, flash, abort, jsonify, Response, g, session
+from markupsafe import Markup
 from config import Config
 from werkzeug.security import check_password_hash
 from functools import wraps
 from firebase_config import initialize_firebase
+from board_store import LOCAL_MEDIA_PREFIX
+from firebase_admin import firestore
+from google.api_core.exceptions import (DeadlineExceeded, GoogleAPIError, InternalServerError, NotFound,
+                                        RetryError, ServiceUnavailable, TooManyRequests, Unknown)
+from google.api_core.retry import Retry
+from rate_limit import AdmissionControl, Rejected, create_backend
+from resilience import CircuitBreaker, SnapshotStore, WriteQueue
 import requests
 from bs4 import BeautifulSoup
 import time
+import json
+import gzip
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import hashlib
 import os
 import re
+import uuid
 from urllib.parse import urlparse
 from werkzeug.utils import secure_filename
 import logging
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -31,6 +52,10 @@ except Exception as e:
 # Define MEDIA_FOLDER for both environments
 MEDIA_FOLDER = os.path.join(app.static_folder, 'media')
 
+# Shared pool for media downloads; its size is the global download concurrency
+media_executor = ThreadPoolExecutor(max_workers=app.config["MEDIA_GLOBAL_CONCURRENCY"],
+                                    thread_name_prefix="media")
+
 # Only create media directory in development, not on Vercel
 if not os.getenv('VERCEL') and not app.config.get('TESTING'):
     try:
@@ -38,6 +63,132 @@ if not os.getenv('VERCEL') and not app.config.get('TESTING'):
     except OSError:
         logger.warning("Could not create media directory - continuing without it")
 
+# --- Firestore availability ---
+# Every Firestore call gets a deadline, and units of Firestore work run
+# through a circuit breaker. While Firestore is down, slow or was never
+# initialized, pages are served read-only from the last board snapshot
+# saved on local disk and writes are queued there for replay.
+
+FIRESTORE_DEADLINE = {
+    "timeout": app.config["FIRESTORE_TIMEOUT"],
+    # Retries of transient errors stop at the same deadline
+    "retry": Retry(timeout=app.config["FIRESTORE_TIMEOUT"])
+}
+
+DEGRADED_FOLDER = app.config["DEGRADED_FOLDER"] or os.path.join(app.instance_path, 'degraded')
+firestore_breaker = CircuitBreaker(app.config["BREAKER_FAILURE_THRESHOLD"],
+                                   app.config["BREAKER_RESET_TIMEOUT"])
+board_snapshots = SnapshotStore(os.path.join(DEGRADED_FOLDER, 'snapshots'),
+                                app.config["SNAPSHOT_INTERVAL"])
+write_queue = WriteQueue(os.path.join(DEGRADED_FOLDER, 'write-queue.ndjson'))
+
+# Writes that can be queued, by name, so they can be replayed from the queue
+write_operations = {}
+_replay_thread = None
+_replay_lock = threading.Lock()
+
+# Errors that mean Firestore could not serve a call; others, like NotFound, are answers
+FIRESTORE_OUTAGE_ERRORS = (DeadlineExceeded, InternalServerError, RetryError, ServiceUnavailable,
+                           TooManyRequests, Unknown)
+
+class FirestoreUnavailable(Exception):
+    pass
+
+@contextmanager
+def firestore_guard():
+    """Run a unit of Firestore work through the circuit breaker.
+    
+    Raises FirestoreUnavailable without touching Firestore while the circuit
+    is open, and when a call inside the block fails or misses its deadline.
+    Other API errors, such as NotFound, show Firestore is up and propagate as is.
+    """
+    global db
+    if not firestore_breaker.allow():
+        raise FirestoreUnavailable("Firestore circuit is open")
+    if db is None:
+        # Firebase failed to initialize at import; try again whenever the breaker allows
+        try:
+            db = initialize_firebase()
+            logger.info("Firebase initialized successfully")
+        except Exception as e:
+            firestore_breaker.record_failure()
+            raise FirestoreUnavailable(f"Firebase is not initialized: {str(e)}") from e
+    try:
+        yield
+    except FIRESTORE_OUTAGE_ERRORS as e:
+        firestore_breaker.record_failure()
+        raise FirestoreUnavailable(str(e)) from e
+    except GoogleAPIError:
+        firestore_breaker.record_success()
+        raise
+    except BaseException:
+        firestore_breaker.release()
+        raise
+    firestore_breaker.record_success()
+    schedule_replay()
+
+def unavailable(error):
+    logger.warning(f"Firestore unavailable: {str(error)}")
+    return Response('The database is unavailable. Please try again shortly.\n', 503,
+                    {'Retry-After': str(max(1, round(firestore_breaker.retry_after())))})
+
+def new_document_id():
+    """An id chosen before writing, so a replayed write cannot create a duplicate"""
+    return uuid.uuid4().hex[:20]
+
+def write_operation(f):
+    write_operations[f.__name__] = f
+    return f
+
+def perform_write(operation, **params):
+    """Apply a write now, or queue it while Firestore is unavailable.
+    
+    Returns (queued, result). Writes are also queued while older ones are
+    still waiting, so they are applied in the order they were made.
+    """
+    if not write_queue.pending():
+        try:
+            with firestore_guard():
+                result = write_operations[operation](**params)
+            if params.get("board_id"):
+                board_snapshots.expire(f"board-{params['board_id']}")
+            return False, result
+        except FirestoreUnavailable as e:
+            logger.warning(f"Queueing {operation} until Firestore recovers: {str(e)}")
+    write_queue.append({"operation": operation, "params": params, "queued_at": time.time()})
+    schedule_replay()
+    return True, None
+
+def replay_writes():
+    """Apply queued writes oldest first, stopping if Firestore fails again"""
+    def apply(entry):
+        try:
+            with firestore_guard():
+                write_operations[entry["operation"]](**entry["params"])
+            if entry["params"].get("board_id"):
+                board_snapshots.expire(f"board-{entry['params']['board_id']}")
+        except FirestoreUnavailable:
+            return False
+        except Exception as e:
+            logger.error(f"Dropping queued {entry['operation']} write: {str(e)}")
+        return True
+    
+    applied = write_queue.replay(apply)
+    if applied:
+        logger.info(f"Replayed {applied} queued writes")
+    return applied
+
+def schedule_replay():
+    """Start replaying queued writes in the background if any are waiting"""
+    global _replay_thread
+    if not write_queue.pending() or firestore_breaker.state != CircuitBreaker.CLOSED:
+        return
+    with _replay_lock:
+        if _replay_thread is not None and _replay_thread.is_alive():
+            return
+        _replay_thread = threading.Thread(target=replay_writes, name="write-replay", daemon=True)
+        _replay_thread.start()
+
 # --- HTTP Basic Authentication ---
 def check_auth(username, password):
     try:
@@ -81,29 +232,237 @@ def requires_auth(f):
         auth = request.authorization
         if not auth or not check_auth(auth.username, auth.password):
             return authenticate()
+        try:
+            g.board_id = select_board(auth.username)
+        except FirestoreUnavailable as e:
+            return unavailable(e)
+        if not g.board_id:
+            return Response('You are not a member of any board.\n', 403)
         return f(*args, **kwargs)
     return decorated
 
+# --- Boards ---
+# Each board keeps its categories and tweets in subcollections of
+# boards/<board_id> and lists the Basic-auth usernames that may use it, so
+# the cost of loading a board depends only on that board's own data.
+
+_membership_cache = {}
+_membership_cache_lock = threading.Lock()
+
+def configured_usernames():
+    """Usernames from BASIC_AUTH_USERNAME1, BASIC_AUTH_USERNAME2, ..."""
+    usernames = []
+    user_num = 1
+    while app.config.get(f"BASIC_AUTH_USERNAME{user_num}"):
+        usernames.append(app.config[f"BASIC_AUTH_USERNAME{user_num}"])
+        user_num += 1
+    return usernames
+
+def board_ref(board_id=None):
+    return db.collection('boards').document(board_id or g.board_id)
+
+def board_collection(name, board_id=None):
+    """A board's 'categories' or 'tweets' collection, for the current request's board by default"""
+    return board_ref(board_id).collection(name)
+
+def user_boards(username):
+    """Boards the user is a member of, as [{"id", "name"}], cached for BOARD_CACHE_TTL seconds.
+    
+    While Firestore is unavailable the last known memberships are used, and
+    FirestoreUnavailable is raised only if there are none.
+    """
+    with _membership_cache_lock:
+        cached = _membership_cache.get(username)
+        if cached and time.monotonic() < cached[0]:
+            return cached[1]
+    
+    try:
+        with firestore_guard():
+            boards_ref = db.collection('boards').where('members', 'array_contains', username).stream(**FIRESTORE_DEADLINE)
+            boards = sorted(({"id": doc.id, "name": doc.to_dict().get("name") or doc.id} for doc in boards_ref),
+                            key=lambda board: board["name"].lower())
+    except FirestoreUnavailable:
+        if cached:
+            return cached[1]
+        snapshot = board_snapshots.load(f"user-{username}")
+        if snapshot is None:
+            raise
+        boards = snapshot[1]
+        with _membership_cache_lock:
+            _membership_cache[username] = (0, boards)
+        return boards
+    
+    board_snapshots.save(f"user-{username}", boards)
+    with _membership_cache_lock:
+        _membership_cache[username] = (time.monotonic() + app.config["BOARD_CACHE_TTL"], boards)
+    return boards
+
+def invalidate_membership_cache(username=None):
+    with _membership_cache_lock:
+        if username:
+            _membership_cache.pop(username, None)
+        else:
+            _membership_cache.clear()
+
+def select_board(username):
+    """The board for this request: ?board=, then the session's board, then the user's first board.
+    
+    A board picked with ?board= becomes the session's board, since forms,
+    redirects and tweet delete URLs do not carry it.
+    """
+    boards = user_boards(username)
+    board_ids = {board["id"] for board in boards}
+    requested = request.args.get("board")
+    if requested in board_ids:
+        session["board_id"] = requested
+        return requested
+    if session.get("board_id") in board_ids:
+        return session["board_id"]
+    return boards[0]["id"] if boards else None
+
+@app.context_processor
+def inject_boards():
+    if "board_id" not in g:
+        return {}
+    auth = request.authorization
+    return {"current_board_id": g.board_id, "boards": user_boards(auth.username) if auth else []}
+
+# --- Admission control ---
+
+ingest_admission = AdmissionControl(
+    create_backend(app.config["RATE_LIMIT_BACKEND"]),
+    per_minute=app.config["RATE_LIMIT_PER_MINUTE"],
+    burst=app.config["RATE_LIMIT_BURST"],
+    max_in_flight=app.config["INGEST_MAX_IN_FLIGHT"],
+    max_queued=app.config["INGEST_MAX_QUEUED"],
+    queue_timeout=app.config["INGEST_QUEUE_TIMEOUT"],
+    lease_timeout=app.config["INGEST_LEASE_TIMEOUT"]
+)
+
+def requires_admission(f):
+    """Limit ingest routes per user and globally, answering 429 instead of queueing without bound"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not app.config.get("ADMISSION_CONTROL"):
+            return f(*args, **kwargs)
+        auth = request.authorization
+        user = auth.username if auth else "unknown"
+        try:
+            lease = ingest_admission.admit(user)
+        except Rejected as e:
+            logger.info(f"Rejected {request.path} for {user}: {e.reason}")
+            return Response(f"{e.reason}.\n", 429, {'Retry-After': str(e.retry_after)})
+        try:
+            return f(*args, **kwargs)
+        finally:
+            ingest_admission.release(lease)
+    return decorated
+
+# --- Rendering ---
+
+# Rendered tweet bubbles per board, keyed by tweet id and each stored with
+# the content version it was rendered from, so a board render mostly joins
+# cached HTML. Every board has its own LRU and TWEET_FRAGMENT_CACHE_SIZE caps
+# them all together: when full, the largest board gives up its least
+# recently used fragment, so a large board cannot evict a small one's.
+tweet_fragment_caches = {}
+_tweet_fragment_lock = threading.Lock()
+_static_fingerprints = {}
+
+def tweet_version(tweet):
+    """Cheap fingerprint of the tweet fields that affect its rendered bubble"""
+    return hash(repr(sorted(tweet.items())))
+
+def render_tweet(tweet, board_id=None):
+    """Render one tweet bubble, reusing the cached fragment while the tweet is unchanged"""
+    version = tweet_version(tweet)
+    with _tweet_fragment_lock:
+        tweet_fragment_cache = tweet_fragment_caches.setdefault(board_id or g.board_id, OrderedDict())
+        cached = tweet_fragment_cache.get(tweet["id"])
+        if cached and cached[0] == version:
+            tweet_fragment_cache.move_to_end(tweet["id"])
+            return cached[1]
+    
+    media_urls = [url for url in (tweet.get("media_urls") or "").split(",") if url]
+    # Straight from the Jinja environment: render_template would run every
+    # context processor (including the board lookup) once per tweet
+    html = Markup(app.jinja_env.get_template("_tweet.html").render(tweet=tweet, media_urls=media_urls))
+    
+    with _tweet_fragment_lock:
+        tweet_fragment_cache = tweet_fragment_caches.setdefault(board_id or g.board_id, OrderedDict())
+        tweet_fragment_cache[tweet["id"]] = (version, html)
+        tweet_fragment_cache.move_to_end(tweet["id"])
+        cached_count = sum(len(cache) for cache in tweet_fragment_caches.values())
+        while cached_count > app.config["TWEET_FRAGMENT_CACHE_SIZE"]:
+            max(tweet_fragment_caches.values(), key=len).popitem(last=False)
+            cached_count -= 1
+    return html
+
+def forget_tweet_fragment(tweet_id, board_id=None):
+    with _tweet_fragment_lock:
+        tweet_fragment_caches.get(board_id or g.board_id, {}).pop(tweet_id, None)
+
+def render_board(categories, snapshot_saved_at=None):
+    """Render the board page; snapshot_saved_at marks a read-only copy served while Firestore is down"""
+    for category in categories:
+        category["tweets_html"] = Markup("").join(render_tweet(tweet) for tweet in category["tweets"])
+    saved_at = time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(snapshot_saved_at)) if snapshot_saved_at else None
+    return render_template("index.html", categories=categories, snapshot_saved_at=saved_at)
+
+@app.template_global()
+def static_url(filename):
+    """URL of a static file with a content fingerprint, so it can be cached indefinitely"""
+    fingerprint = _static_fingerprints.get(filename)
+    if fingerprint is None:
+        with open(os.path.join(app.static_folder, filename), 'rb') as f:
+            fingerprint = hashlib.md5(f.read()).hexdigest()[:12]
+        _static_fingerprints[filename] = fingerprint
+    return url_for('static', filename=filename, v=fingerprint)
+
+@app.after_request
+def cache_fingerprinted_static(response):
+    if request.endpoint == 'static' and request.args.get('v') and response.status_code == 200:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    return response
+
+# Compile every template once at startup instead of on first use
+for template_name in app.jinja_env.list_templates():
+    app.jinja_env.get_template(template_name)
+
 # --- Routes ---
 
+def load_board(board_id):
+    """A board's categories ordered by position, each with its tweets"""
+    categories = []
+    for cat_doc in board_collection('categories', board_id).order_by('position').stream(**FIRESTORE_DEADLINE):
+        category = {"id": cat_doc.id, **cat_doc.to_dict(), "tweets": []}
+        
+        # Get tweets for this category
+        tweets_ref = board_collection('tweets', board_id).where('category', '==', cat_doc.id).stream(**FIRESTORE_DEADLINE)
+        category["tweets"] = [{"id": tweet.id, **tweet.to_dict()} for tweet in tweets_ref]
+        
+        categories.append(category)
+    return categories
+
 @app.route("/")
 @requires_auth
 def index():
     try:
-        # Get categories ordered by position from Firestore
-        categories_ref = db.collection('categories').order_by('position').stream()
-        categories = []
+        try:
+            with firestore_guard():
+                categories = load_board(g.board_id)
+        except FirestoreUnavailable as e:
+            snapshot = board_snapshots.load(f"board-{g.board_id}")
+            if snapshot is None:
+                return unavailable(e)
+            saved_at, categories = snapshot
+            return render_board(categories, snapshot_saved_at=saved_at)
         
-        for cat_doc in categories_ref:
-            category = {"id": cat_doc.id, **cat_doc.to_dict(), "tweets": []}
-            
-            # Get tweets for this category
-            tweets_ref = db.collection('tweets').where('category', '==', cat_doc.id).stream()
-            category["tweets"] = [{"id": tweet.id, **tweet.to_dict()} for tweet in tweets_ref]
-            
-            categories.append(category)
-            
-        return render_template("index.html", categories=categories)
+        board_snapshots.save(f"board-{g.board_id}", categories)
+        return render_board(categories)
     except Exception as e:
         logger.error(f"Error in index route: {str(e)}")
         return f"An error occurred while loading categories. Please try again. Error: {str(e)}", 500
@@ -112,24 +471,36 @@ def index():
 def create_tables():
     pass
 
+def flash_queued():
+    flash("The database is unavailable, so your change was queued and will be applied once it recovers.", "warning")
+
+@write_operation
+def create_category(board_id, category_id, name):
+    # Get the highest position
+    max_position = 0
+    categories_ref = board_collection('categories', board_id).stream(**FIRESTORE_DEADLINE)
+    for category in categories_ref:
+        if category.to_dict().get('position', 0) > max_position:
+            max_position = category.to_dict().get('position', 0)
+    category_ref = board_collection('categories', board_id).document(category_id)
+    category_ref.set({
+        'name': name,
+        'position': max_position + 1
+    }, **FIRESTORE_DEADLINE)
+    invalidate_category_cache(board_id)
+
 @app.route("/add_category", methods=["POST"])
 @requires_auth
 def add_category():
     try:
         name = request.form.get("name", "").strip()
         if name:
-            # Get the highest position
-            max_position = 0
-            categories_ref = db.collection('categories').stream()
-            for category in categories_ref:
-                if category.to_dict().get('position', 0) > max_position:
-                    max_position = category.to_dict().get('position', 0)
-            category_ref = db.collection('categories').document()
-            category_ref.set({
-                'name': name,
-                'position': max_position + 1
-            })
-            flash("Category added successfully.", "success")
+            queued, _ = perform_write("create_category", board_id=g.board_id,
+                                      category_id=new_document_id(), name=name)
+            if queued:
+                flash_queued()
+            else:
+                flash("Category added successfully.", "success")
         else:
             flash("Category name cannot be empty.", "danger")
         return redirect(url_for("index"))
@@ -137,89 +508,104 @@ def add_category():
         logger.error(f"Error in add_category route: {str(e)}")
         return "An error occurred while adding category. Please try again.", 500
 
+@write_operation
+def remove_category(board_id, category_id):
+    # Get tweets for this category first
+    tweets_ref = board_collection('tweets', board_id).where('category', '==', category_id).stream(**FIRESTORE_DEADLINE)
+    
+    # Delete all tweets in this category
+    for tweet in tweets_ref:
+        # Delete associated media files
+        if tweet.to_dict().get('media_urls'):
+            for url in tweet.to_dict().get('media_urls').split(','):
+                delete_media(url)
+        # Delete the tweet document
+        board_collection('tweets', board_id).document(tweet.id).delete(**FIRESTORE_DEADLINE)
+        forget_tweet_fragment(tweet.id, board_id)
+    
+    # Now delete the category
+    category_ref = board_collection('categories', board_id).document(category_id)
+    category_ref.delete(**FIRESTORE_DEADLINE)
+    invalidate_category_cache(board_id)
+
 @app.route("/delete_category/<category_id>", methods=["POST"])
 @requires_auth
 def delete_category(category_id):
     try:
-        # Get tweets for this category first
-        tweets_ref = db.collection('tweets').where('category', '==', category_id).stream()
-        
-        # Delete all tweets in this category
-        for tweet in tweets_ref:
-            # Delete associated media files
-            if tweet.to_dict().get('media_urls'):
-                for url in tweet.to_dict().get('media_urls').split(','):
-                    delete_media(url)
-            # Delete the tweet document
-            db.collection('tweets').document(tweet.id).delete()
-        
-        # Now delete the category
-        category_ref = db.collection('categories').document(category_id)
-        category_ref.delete()
-        
-        flash("Category deleted.", "success")
+        queued, _ = perform_write("remove_category", board_id=g.board_id, category_id=category_id)
+        if queued:
+            flash_queued()
+        else:
+            flash("Category deleted.", "success")
         return redirect(url_for("index"))
     except Exception as e:
         logger.error(f"Error in delete_category route: {str(e)}")
         return f"An error occurred while deleting category. Please try again. Error: {str(e)}", 500
 
+@write_operation
+def create_tweet(board_id, tweet_id, document, category_id, new_category_name, new_category_id):
+    """Store an already scraped tweet document, creating its category first when given by name.
+    
+    The scrape and media downloads happen before this runs, outside the
+    circuit breaker, so a queued write replays without scraping again.
+    """
+    # Decide which category to use
+    if new_category_name:
+        category_ref = board_collection('categories', board_id).where('name', '==', new_category_name).stream(**FIRESTORE_DEADLINE)
+        category = next(category_ref, None)
+        if not category:
+            category_ref = board_collection('categories', board_id).document(new_category_id)
+            category_ref.set({
+                'name': new_category_name,
+                'position': 0
+            }, **FIRESTORE_DEADLINE)
+            invalidate_category_cache(board_id)
+            category = category_ref
+    else:
+        category = board_collection('categories', board_id).document(str(category_id))
+    
+    store_tweet(board_id, tweet_id, dict(document, category=category.id))
+
 @app.route("/add_tweet", methods=["POST"])
 @requires_auth
+@requires_admission
 def add_tweet():
     try:
         tweet_url = request.form.get("tweet_url", "").strip()
         category_id = request.form.get("category_id")
         new_category_name = request.form.get("new_category")
         
-        # Decide which category to use
-        if new_category_name:
-            category_ref = db.collection('categories').where('name', '==', new_category_name).stream()
-            category = next(category_ref, None)
-            if not category:
-                category_ref = db.collection('categories').document()
-                category_ref.set({
-                    'name': new_category_name,
-                    'position': 0
-                })
-                category = category_ref
-        elif category_id:
-            category_ref = db.collection('categories').document(str(category_id))
-            category = category_ref.get()
-        else:
+        if not new_category_name and not category_id:
             flash("No category selected or provided.", "danger")
             return redirect(url_for("index"))
         
         if tweet_url:
-            # Delay to avoid overwhelming Twitter's servers.
-            time.sleep(2)
-            tweet_data = scrape_tweet(tweet_url)
-            if tweet_data:
-                # Download media files and get local URLs
-                local_media_urls = []
-                if tweet_data.get("media"):
-                    for url in tweet_data["media"]:
-                        local_url = download_media(url)
-                        if local_url:
-                            local_media_urls.append(local_url)
-                
-                auth = request.authorization
-                added_by = auth.username if auth else "unknown"
-                
-                tweet_ref = db.collection('tweets').document()
-                tweet_ref.set({
-                    'tweet_text': tweet_data["text"],
-                    'author': tweet_data["author"],
-                    'username': tweet_data["username"],
-                    'timestamp': tweet_data["timestamp"],
-                    'media_urls': ",".join(local_media_urls) if local_media_urls else None,
-                    'category': category.id,
-                    'original_url': tweet_url,
-                    'added_by': added_by
-                })
-                
-                flash("Tweet added successfully.", "success")
-            else:
+            auth = request.authorization
+            added_by = auth.username if auth else "unknown"
+            
+            fetched = fetch_tweet(tweet_url)
+            if not fetched:
                 flash("Failed to fetch tweet data.", "danger")
+                return redirect(url_for("index"))
+            
+            tweet_data, local_media_urls = fetched
+            try:
+                queued, _ = perform_write(
+                    "create_tweet", board_id=g.board_id, tweet_id=new_document_id(),
+                    document=tweet_document(tweet_data, local_media_urls, None, tweet_url, added_by),
+                    category_id=category_id, new_category_name=new_category_name,
+                    new_category_id=new_document_id())
+            except NotFound:
+                # The category was deleted, so the version bump in the same batch failed
+                for url in local_media_urls:
+                    delete_media(url)
+                flash("Category not found.", "danger")
+                return redirect(url_for("index"))
+            
+            if queued:
+                flash_queued()
+            else:
+                flash("Tweet added successfully.", "success")
         else:
             flash("Tweet URL cannot be empty.", "danger")
         return redirect(url_for("index"))
@@ -227,49 +613,389 @@ def add_tweet():
         logger.error(f"Error in add_tweet route: {str(e)}")
         return "An error occurred while adding tweet. Please try again.", 500
 
+@write_operation
+def remove_tweet(board_id, tweet_id):
+    """Delete a tweet and its media; returns whether the tweet existed"""
+    tweet_ref = board_collection('tweets', board_id).document(tweet_id)
+    tweet = tweet_ref.get(**FIRESTORE_DEADLINE)
+    
+    if not tweet.exists:
+        return False
+    
+    batch = db.batch()
+    batch.delete(tweet_ref)
+    bump_category_version(batch, board_id, tweet.to_dict().get('category'))
+    batch.commit(**FIRESTORE_DEADLINE)
+    forget_tweet_fragment(tweet_id, board_id)
+    invalidate_category_cache(board_id)
+    
+    # Delete associated media files once the tweet is gone
+    if tweet.to_dict().get('media_urls'):
+        for url in tweet.to_dict().get('media_urls').split(','):
+            delete_media(url)
+    return True
+
 @app.route("/delete_tweet/<tweet_id>", methods=["POST"])
 @requires_auth
 def delete_tweet(tweet_id):
     try:
-        tweet_ref = db.collection('tweets').document(tweet_id)
-        tweet = tweet_ref.get()
-        
-        if not tweet.exists:
+        queued, found = perform_write("remove_tweet", board_id=g.board_id, tweet_id=tweet_id)
+        if queued:
+            flash_queued()
+        elif not found:
             flash("Tweet not found.", "error")
-            return redirect(url_for("index"))
-        
-        # Delete associated media files
-        if tweet.to_dict().get('media_urls'):
-            for url in tweet.to_dict().get('media_urls').split(','):
-                delete_media(url)
-        
-        tweet_ref.delete()
-        flash("Tweet deleted successfully.", "success")
+        else:
+            flash("Tweet deleted successfully.", "success")
         return redirect(url_for("index"))
     except Exception as e:
         logger.error(f"Error in delete_tweet route: {str(e)}")
         return f"An error occurred while deleting tweet. Please try again. Error: {str(e)}", 500
 
+@write_operation
+def reorder_categories(board_id, order):
+    # Update each category's position
+    for position, category_id in enumerate(order):
+        category_ref = board_collection('categories', board_id).document(str(category_id))
+        category_ref.update({
+            'position': position
+        }, **FIRESTORE_DEADLINE)
+    invalidate_category_cache(board_id)
+
 @app.route("/update_category_order", methods=["POST"])
 @requires_auth
 def update_category_order():
     try:
         order = request.json.get("order", [])
         if order:
-            # Update each category's position
-            for position, category_id in enumerate(order):
-                category_ref = db.collection('categories').document(str(category_id))
-                category_ref.update({
-                    'position': position
-                })
+            queued, _ = perform_write("reorder_categories", board_id=g.board_id, order=order)
+            if queued:
+                return jsonify({"success": True, "queued": True}), 202
             return jsonify({"success": True})
         return jsonify({"success": False, "error": "No order provided"}), 400
     except Exception as e:
         logger.error(f"Error in update_category_order route: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@app.route("/switch_board", methods=["POST"])
+@requires_auth
+def switch_board():
+    board_id = request.form.get("board_id")
+    auth = request.authorization
+    if board_id in {board["id"] for board in user_boards(auth.username)}:
+        session["board_id"] = board_id
+    else:
+        flash("You are not a member of that board.", "danger")
+    return redirect(url_for("index"))
+
+@write_operation
+def create_board(board_id, name, username):
+    board_ref(board_id).set({
+        'name': name,
+        'members': [username]
+    }, **FIRESTORE_DEADLINE)
+    invalidate_membership_cache(username)
+
+@app.route("/add_board", methods=["POST"])
+@requires_auth
+def add_board():
+    try:
+        name = request.form.get("name", "").strip()
+        if not name:
+            flash("Board name cannot be empty.", "danger")
+            return redirect(url_for("index"))
+        
+        auth = request.authorization
+        board_id = new_document_id()
+        queued, _ = perform_write("create_board", board_id=board_id, name=name, username=auth.username)
+        session["board_id"] = board_id
+        if queued:
+            flash_queued()
+        else:
+            flash("Board created.", "success")
+        return redirect(url_for("index"))
+    except Exception as e:
+        logger.error(f"Error in add_board route: {str(e)}")
+        return "An error occurred while adding board. Please try again.", 500
+
+@write_operation
+def add_member(board_id, username):
+    board_ref(board_id).update({
+        'members': firestore.ArrayUnion([username])
+    }, **FIRESTORE_DEADLINE)
+    invalidate_membership_cache(username)
+
+@app.route("/add_board_member", methods=["POST"])
+@requires_auth
+def add_board_member():
+    try:
+        username = request.form.get("username", "").strip()
+        if username not in configured_usernames():
+            flash("Unknown user.", "danger")
+            return redirect(url_for("index"))
+        
+        queued, _ = perform_write("add_member", board_id=g.board_id, username=username)
+        if queued:
+            flash_queued()
+        else:
+            flash(f"{username} can now use this board.", "success")
+        return redirect(url_for("index"))
+    except Exception as e:
+        logger.error(f"Error in add_board_member route: {str(e)}")
+        return "An error occurred while adding board member. Please try again.", 500
+
+# --- JSON API ---
+# Every category carries a 'version' that is bumped whenever its tweets
+# change. ETags are built from those versions, which are read through a
+# short-lived in-process cache, so a client polling an unchanged board gets
+# a 304 without any Firestore reads.
+
+API_TWEET_FIELDS = ('tweet_text', 'author', 'username', 'timestamp', 'media_urls',
+                    'original_url', 'added_by')
+# Per-board {"expires", "categories"} entries
+_category_cache = {}
+_category_cache_lock = threading.Lock()
+
+def invalidate_category_cache(board_id=None):
+    with _category_cache_lock:
+        _category_cache.pop(board_id or g.board_id, None)
+
+def get_cached_categories(board_id=None):
+    """A board's categories ordered by position, re-read from Firestore at most every API_CACHE_TTL seconds"""
+    board_id = board_id or g.board_id
+    with _category_cache_lock:
+        cached = _category_cache.get(board_id)
+        if cached and time.monotonic() < cached["expires"]:
+            return cached["categories"]
+    
+    categories = []
+    for cat_doc in board_collection('categories', board_id).order_by('position').stream(**FIRESTORE_DEADLINE):
+        data = cat_doc.to_dict()
+        categories.append({
+            "id": cat_doc.id,
+            "name": data.get("name"),
+            "position": data.get("position", 0),
+            "version": data.get("version", 0)
+        })
+    
+    with _category_cache_lock:
+        _category_cache[board_id] = {
+            "expires": time.monotonic() + app.config["API_CACHE_TTL"],
+            "categories": categories
+        }
+    return categories
+
+def bump_category_version(batch, board_id, category_id):
+    """Bump a category's version in the batch that changes its tweets, so API clients see a new ETag.
+    
+    Sharing the batch means the version changes exactly when the tweets do.
+    """
+    if category_id:
+        batch.update(board_collection('categories', board_id).document(str(category_id)), {
+            'version': firestore.Increment(1)
+        })
+
+def api_tweet_fields():
+    """Tweet fields requested with ?fields=a,b; all fields when not given"""
+    requested = request.args.get("fields")
+    if not requested:
+        return API_TWEET_FIELDS
+    return tuple(field for field in requested.split(",") if field in API_TWEET_FIELDS)
+
+def api_tweet(data, fields):
+    tweet = {"id": data["id"]}
+    for field in fields:
+        value = data.get(field)
+        if field == "media_urls":
+            value = [url for url in (value or "").split(",") if url]
+        tweet[field] = value
+    return tweet
+
+def api_etag(*parts):
+    return hashlib.md5(json.dumps(parts, separators=(",", ":")).encode()).hexdigest()
+
+def not_modified(etag):
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.cache_control.no_cache = True
+        response.vary.add("Accept-Encoding")
+        return response
+    return None
+
+def api_response(payload, etag=None):
+    """Compact JSON response, compressed with brotli or gzip when the client accepts it"""
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    response = Response(body, mimetype="application/json")
+    
+    if len(body) >= app.config["API_COMPRESS_MIN_SIZE"]:
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            response.set_data(brotli.compress(body, quality=5))
+            response.content_encoding = "br"
+        elif accepted["gzip"]:
+            response.set_data(gzip.compress(body, compresslevel=6))
+            response.content_encoding = "gzip"
+    
+    if etag:
+        response.set_etag(etag, weak=True)
+    response.cache_control.no_cache = True
+    response.vary.add("Accept-Encoding")
+    return response
+
+def api_snapshot_response(payload, saved_at):
+    """Response for data read from the board snapshot while Firestore is unavailable"""
+    payload["snapshot_saved_at"] = datetime.fromtimestamp(saved_at, timezone.utc).isoformat()
+    response = api_response(payload)
+    response.headers["Warning"] = '111 - "Revalidation Failed"'
+    return response
+
+def api_snapshot(error):
+    """The board snapshot as (saved_at, categories), or an error response if there is none"""
+    snapshot = board_snapshots.load(f"board-{g.board_id}")
+    if snapshot is None:
+        logger.warning(f"Firestore unavailable: {str(error)}")
+        response = jsonify({"error": "The database is unavailable"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(max(1, round(firestore_breaker.retry_after())))
+        return None, response
+    return snapshot, None
+
+@app.route("/api/v1/board")
+@requires_auth
+def api_board():
+    try:
+        include_tweets = request.args.get("include") == "tweets"
+        fields = api_tweet_fields()
+        try:
+            with firestore_guard():
+                categories = get_cached_categories()
+                etag = api_etag(g.board_id, [[c["id"], c["name"], c["position"], c["version"]] for c in categories],
+                                include_tweets, fields)
+                cached = not_modified(etag)
+                if cached:
+                    return cached
+                
+                payload = {"board": g.board_id, "categories": []}
+                for category in categories:
+                    entry = dict(category)
+                    if include_tweets:
+                        tweets_ref = board_collection('tweets').where('category', '==', category["id"]).stream(**FIRESTORE_DEADLINE)
+                        entry["tweets"] = [api_tweet({"id": tweet.id, **tweet.to_dict()}, fields) for tweet in tweets_ref]
+                    payload["categories"].append(entry)
+        except FirestoreUnavailable as e:
+            snapshot, error_response = api_snapshot(e)
+            if error_response:
+                return error_response
+            saved_at, categories = snapshot
+            payload = {"board": g.board_id, "categories": []}
+            for category in categories:
+                entry = {key: category.get(key, 0 if key in ("position", "version") else None)
+                         for key in ("id", "name", "position", "version")}
+                if include_tweets:
+                    entry["tweets"] = [api_tweet(tweet, fields) for tweet in category["tweets"]]
+                payload["categories"].append(entry)
+            return api_snapshot_response(payload, saved_at)
+        return api_response(payload, etag)
+    except Exception as e:
+        logger.error(f"Error in api_board route: {str(e)}")
+        return jsonify({"error": "Could not load board"}), 500
+
+@app.route("/api/v1/categories/<category_id>/tweets")
+@requires_auth
+def api_category_tweets(category_id):
+    try:
+        fields = api_tweet_fields()
+        try:
+            with firestore_guard():
+                category = next((c for c in get_cached_categories() if c["id"] == category_id), None)
+                if category is None:
+                    return jsonify({"error": "Category not found"}), 404
+                
+                etag = api_etag(g.board_id, category_id, category["version"], fields)
+                cached = not_modified(etag)
+                if cached:
+                    return cached
+                
+                tweets_ref = board_collection('tweets').where('category', '==', category_id).stream(**FIRESTORE_DEADLINE)
+                tweets = [api_tweet({"id": tweet.id, **tweet.to_dict()}, fields) for tweet in tweets_ref]
+        except FirestoreUnavailable as e:
+            snapshot, error_response = api_snapshot(e)
+            if error_response:
+                return error_response
+            saved_at, categories = snapshot
+            category = next((c for c in categories if c["id"] == category_id), None)
+            if category is None:
+                return jsonify({"error": "Category not found"}), 404
+            return api_snapshot_response({
+                "board": g.board_id,
+                "category": category_id,
+                "version": category.get("version", 0),
+                "tweets": [api_tweet(tweet, fields) for tweet in category["tweets"]]
+            }, saved_at)
+        return api_response({
+            "board": g.board_id,
+            "category": category_id,
+            "version": category["version"],
+            "tweets": tweets
+        }, etag)
+    except Exception as e:
+        logger.error(f"Error in api_category_tweets route: {str(e)}")
+        return jsonify({"error": "Could not load tweets"}), 500
+
+# Placeholders stored when the scraper cannot find a field
+TWEET_TEXT_NOT_FOUND = "Tweet text not found."
+UNKNOWN = "Unknown"
+
+def is_degraded(tweet_data):
+    """Whether a scrape fell back to placeholders and is worth retrying later"""
+    return (tweet_data["text"] == TWEET_TEXT_NOT_FOUND
+            or tweet_data["author"] == UNKNOWN
+            or tweet_data["timestamp"] in (UNKNOWN, ""))
+
+def tweet_document(tweet_data, local_media_urls, category_id, tweet_url, added_by):
+    """Build the Firestore document stored for a scraped tweet"""
+    return {
+        'tweet_text': tweet_data["text"],
+        'author': tweet_data["author"],
+        'username': tweet_data["username"],
+        'timestamp': tweet_data["timestamp"],
+        'media_urls': ",".join(local_media_urls) if local_media_urls else None,
+        'category': category_id,
+        'original_url': tweet_url,
+        'added_by': added_by,
+        # Indexed fields the background refresher queries on (see refresher.py)
+        'degraded': is_degraded(tweet_data),
+        'media_checked_at': time.time(),
+        'refresh_after': 0
+    }
+
+def fetch_tweet(tweet_url):
+    """Scrape a tweet and download its media; returns (tweet_data, local_media_urls) or None"""
+    # Delay to avoid overwhelming Twitter's servers.
+    time.sleep(app.config.get("SCRAPE_DELAY", 2))
+    tweet_data = scrape_tweet(tweet_url)
+    if not tweet_data:
+        return None
+    
+    # Download media files and get local URLs
+    local_media_urls = download_all_media(tweet_data.get("media", []))
+    return tweet_data, local_media_urls
+
+def store_tweet(board_id, tweet_id, document):
+    """Write a tweet document and bump its category's version together"""
+    batch = db.batch()
+    batch.set(board_collection('tweets', board_id).document(tweet_id), document)
+    bump_category_version(batch, board_id, document['category'])
+    batch.commit(**FIRESTORE_DEADLINE)
+    invalidate_category_cache(board_id)
+
 def download_media(url):
-    """Download media from URL and save to storage"""
+    """Download media from URL and save to storage.
+    
+    Returns the local URL, or None if the download fails or times out, so
+    the file is left out of the tweet. The original URL is returned only
+    when the file cannot be stored locally (Vercel, or an unwritable disk).
+    """
     if not url:
         return None
 
@@ -285,20 +1011,75 @@ def download_media(url):
         try:
             local_path = os.path.join(MEDIA_FOLDER, filename)
             if not os.path.exists(local_path):
-                response = requests.get(url)
-                if response.status_code == 200:
-                    with open(local_path, 'wb') as f:
-                        f.write(response.content)
-                    return f'/static/media/{filename}'
+                timeout = app.config.get("MEDIA_TIMEOUT", 15)
+                deadline = time.monotonic() + timeout
+                with requests.get(url, stream=True, timeout=timeout) as response:
+                    if response.status_code == 200:
+                        # Write to a temporary file so a slow or failed download never leaves a partial file
+                        tmp_path = f"{local_path}.{threading.get_ident()}.part"
+                        try:
+                            with open(tmp_path, 'wb') as f:
+                                for chunk in response.iter_content(chunk_size=64 * 1024):
+                                    if time.monotonic() > deadline:
+                                        raise requests.exceptions.Timeout(f"Media download exceeded {timeout}s")
+                                    f.write(chunk)
+                            os.replace(tmp_path, local_path)
+                        finally:
+                            if os.path.exists(tmp_path):
+                                os.remove(tmp_path)
+                        return f'{LOCAL_MEDIA_PREFIX}{filename}'
             else:
-                return f'/static/media/{filename}'
+                return f'{LOCAL_MEDIA_PREFIX}{filename}'
+        # requests' exceptions subclass OSError, so they must be caught first
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Could not download media, leaving it out: {url}: {str(e)}")
+            return None
         except OSError:
             # If we can't write to filesystem, fall back to original URL
             logger.warning(f"Could not save media to disk, using original URL: {url}")
             return url
     except Exception as e:
         logger.error(f"Error in download_media: {str(e)}")
-        return url
+        return None
+
+def download_all_media(urls):
+    """Download a tweet's media on the shared pool, keeping the original order.
+    
+    At most MEDIA_CONCURRENCY files per call and MEDIA_GLOBAL_CONCURRENCY
+    files across all requests are fetched at once. Each file gets
+    MEDIA_TIMEOUT seconds from when it is handed to the pool; files that
+    fail or are still running then are left out, so the result may be
+    shorter than urls. download_media stops an abandoned download at its
+    next chunk.
+    """
+    urls = [url for url in urls if url]
+    timeout = app.config.get("MEDIA_TIMEOUT", 15)
+    per_call_limit = app.config.get("MEDIA_CONCURRENCY", 4)
+    
+    results = [None] * len(urls)
+    waiting = list(enumerate(urls))
+    running = {}
+    while waiting or running:
+        while waiting and len(running) < per_call_limit:
+            index, url = waiting.pop(0)
+            running[media_executor.submit(download_media, url)] = (index, time.monotonic() + timeout)
+        
+        next_deadline = min(deadline for _, deadline in running.values())
+        done, _ = wait(running, timeout=max(0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        for future in done:
+            index, _ = running.pop(future)
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                logger.error(f"Error downloading media {urls[index]}: {str(e)}")
+        
+        now = time.monotonic()
+        for future, (index, deadline) in list(running.items()):
+            if deadline <= now:
+                logger.warning(f"Media download exceeded {timeout}s, leaving it out: {urls[index]}")
+                future.cancel()
+                del running[future]
+    return [local_url for local_url in results if local_url]
 
 def delete_media(local_url):
     """Delete media file from storage"""
@@ -311,7 +1092,7 @@ def delete_media(local_url):
         
     try:
         # Local development: try to delete from disk
-        if local_url.startswith('/static/media/'):
+        if local_url.startswith(LOCAL_MEDIA_PREFIX):
             filename = local_url.split('/')[-1]
             file_path = os.path.join(MEDIA_FOLDER, filename)
             if os.path.exists(file_path):
@@ -322,173 +1103,178 @@ def delete_media(local_url):
     except Exception as e:
         logger.error(f"Error in delete_media: {str(e)}")
 
+SCRAPE_HEADERS = {
+    "User-Agent": "WhatsApp/2.24.1.84",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-User": "?1",
+    "Cache-Control": "max-age=0"
+}
+
 def scrape_tweet(url):
-    headers = {
-        "User-Agent": "WhatsApp/2.24.1.84",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.5",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1",
-        "Sec-Fetch-Dest": "document",
-        "Sec-Fetch-Mode": "navigate",
-        "Sec-Fetch-Site": "none",
-        "Sec-Fetch-User": "?1",
-        "Cache-Control": "max-age=0"
-    }
     try:
         logger.info(f"Attempting to fetch tweet from URL: {url}")
         
         # First try to get the tweet page directly
-        response = requests.get(url, headers=headers, timeout=10)
+        response = requests.get(url, headers=SCRAPE_HEADERS, timeout=10)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Try to find the tweet text
-        tweet_text = None
-        text_selectors = [
-            ('div', {'data-testid': 'tweetText'}),
-            ('div', {'class': 'tweet-text'}),
-            ('div', {'class': 'js-tweet-text-container'}),
-            ('div', {'class': 'css-901oao'}),
-            ('meta', {'property': 'og:description'})
-        ]
-        
-        for tag, attrs in text_selectors:
-            element = soup.find(tag, attrs)
-            if element:
-                tweet_text = element.get('content', element.text).strip()
-                if tweet_text:
-                    break
+        return parse_tweet_html(response.text)
         
-        if not tweet_text:
-            tweet_text = "Tweet text not found."
-        
-        # Try to find the author and username
-        author = "Unknown"
-        username = ""
-        author_selectors = [
-            ('div', {'data-testid': 'User-Name'}),
-            ('div', {'class': 'username'}),
-            ('meta', {'property': 'og:title'}),
-            ('div', {'class': 'css-901oao'})
-        ]
-        
-        for tag, attrs in author_selectors:
-            element = soup.find(tag, attrs)
-            if element:
-                author_text = element.get('content', element.text).strip()
-                if '@' in author_text:
-                    parts = author_text.split(' @')
-                    author = parts[0]
-                    username = parts[1] if len(parts) > 1 else ""
-                else:
-                    author = author_text
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Network error while fetching tweet: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error while scraping tweet: {e}")
+        return None
+
+def parse_tweet_html(html):
+    """Extract tweet text, author, timestamp and media from a tweet page"""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Try to find the tweet text
+    tweet_text = None
+    text_selectors = [
+        ('div', {'data-testid': 'tweetText'}),
+        ('div', {'class': 'tweet-text'}),
+        ('div', {'class': 'js-tweet-text-container'}),
+        ('div', {'class': 'css-901oao'}),
+        ('meta', {'property': 'og:description'})
+    ]
+    
+    for tag, attrs in text_selectors:
+        element = soup.find(tag, attrs)
+        if element:
+            tweet_text = element.get('content', element.text).strip()
+            if tweet_text:
                 break
-        
-        # Try to find the timestamp
-        timestamp = "Unknown"
-        timestamp_selectors = [
-            ('time', {}),
-            ('span', {'class': 'timestamp'}),
-            ('meta', {'property': 'article:published_time'}),
-            ('time', {'datetime': True})
-        ]
-        
-        for tag, attrs in timestamp_selectors:
-            element = soup.find(tag, attrs)
-            if element:
-                timestamp = element.get('datetime', element.text).strip()
-                if timestamp:
-                    break
-        
-        # Try to find media
-        media = []
-        media_selectors = [
-            ('img', {'data-testid': 'tweetPhoto'}),  # Primary tweet photos
-            ('div', {'data-testid': 'tweetPhoto'}, 'img'),  # Tweet photos in containers
-            ('img', {'class': 'css-9pa8cd'}),  # Modern Twitter image class
-            ('div', {'class': 'AdaptiveMedia-container'}, 'img'),  # Legacy Twitter image container
-        ]
-        
-        def is_valid_media_url(url):
-            invalid_patterns = [
-                'profile_images',
-                '/profile/',
-                'twimg.com/profile',
-                'default_profile',
-                'avatar',
-                'emoji',
-                '.svg',
-                'favicon',
-                'logo'
-            ]
-            return url and not any(pattern in url.lower() for pattern in invalid_patterns)
-        
-        # First try direct media in tweet
-        for selector in media_selectors:
-            if len(selector) == 2:
-                tag, attrs = selector
-                elements = soup.find_all(tag, attrs)
-                for element in elements:
-                    src = element.get('src', '')
-                    if is_valid_media_url(src):
-                        if src.startswith('//'):
-                            src = 'https:' + src
-                        media.append(src)
+    
+    if not tweet_text:
+        tweet_text = TWEET_TEXT_NOT_FOUND
+    
+    # Try to find the author and username
+    author = UNKNOWN
+    username = ""
+    author_selectors = [
+        ('div', {'data-testid': 'User-Name'}),
+        ('div', {'class': 'username'}),
+        ('meta', {'property': 'og:title'}),
+        ('div', {'class': 'css-901oao'})
+    ]
+    
+    for tag, attrs in author_selectors:
+        element = soup.find(tag, attrs)
+        if element:
+            author_text = element.get('content', element.text).strip()
+            if '@' in author_text:
+                parts = author_text.split(' @')
+                author = parts[0]
+                username = parts[1] if len(parts) > 1 else ""
             else:
-                tag, attrs, child_tag = selector
-                elements = soup.find_all(tag, attrs)
-                for element in elements:
-                    child = element.find(child_tag)
-                    if child:
-                        src = child.get('src', '')
-                        if is_valid_media_url(src):
-                            if src.startswith('//'):
-                                src = 'https:' + src
-                            media.append(src)
-        
-        # If no media found in direct elements, try meta tags
-        if not media:
-            meta_selectors = [
-                ('meta', {'property': 'og:image'}),
-                ('meta', {'property': 'twitter:image'})
-            ]
-            
-            for tag, attrs in meta_selectors:
-                element = soup.find(tag, attrs)
-                if element:
-                    src = element.get('content', '')
+                author = author_text
+            break
+    
+    # Try to find the timestamp
+    timestamp = UNKNOWN
+    timestamp_selectors = [
+        ('time', {}),
+        ('span', {'class': 'timestamp'}),
+        ('meta', {'property': 'article:published_time'}),
+        ('time', {'datetime': True})
+    ]
+    
+    for tag, attrs in timestamp_selectors:
+        element = soup.find(tag, attrs)
+        if element:
+            timestamp = element.get('datetime', element.text).strip()
+            if timestamp:
+                break
+    
+    # Try to find media
+    media = []
+    media_selectors = [
+        ('img', {'data-testid': 'tweetPhoto'}),  # Primary tweet photos
+        ('div', {'data-testid': 'tweetPhoto'}, 'img'),  # Tweet photos in containers
+        ('img', {'class': 'css-9pa8cd'}),  # Modern Twitter image class
+        ('div', {'class': 'AdaptiveMedia-container'}, 'img'),  # Legacy Twitter image container
+    ]
+    
+    def is_valid_media_url(url):
+        invalid_patterns = [
+            'profile_images',
+            '/profile/',
+            'twimg.com/profile',
+            'default_profile',
+            'avatar',
+            'emoji',
+            '.svg',
+            'favicon',
+            'logo'
+        ]
+        return url and not any(pattern in url.lower() for pattern in invalid_patterns)
+    
+    # First try direct media in tweet
+    for selector in media_selectors:
+        if len(selector) == 2:
+            tag, attrs = selector
+            elements = soup.find_all(tag, attrs)
+            for element in elements:
+                src = element.get('src', '')
+                if is_valid_media_url(src):
+                    if src.startswith('//'):
+                        src = 'https:' + src
+                    media.append(src)
+        else:
+            tag, attrs, child_tag = selector
+            elements = soup.find_all(tag, attrs)
+            for element in elements:
+                child = element.find(child_tag)
+                if child:
+                    src = child.get('src', '')
                     if is_valid_media_url(src):
                         if src.startswith('//'):
                             src = 'https:' + src
                         media.append(src)
+    
+    # If no media found in direct elements, try meta tags
+    if not media:
+        meta_selectors = [
+            ('meta', {'property': 'og:image'}),
+            ('meta', {'property': 'twitter:image'})
+        ]
         
-        # Remove duplicates while preserving order
-        media = list(dict.fromkeys(media))
-        
-        result = {
-            "text": tweet_text,
-            "author": author,
-            "username": username,
-            "timestamp": timestamp,
-            "media": media
-        }
-        
-        logger.info("Successfully extracted tweet data:")
-        logger.info(f"Author: {author}")
-        logger.info(f"Username: {username}")
-        logger.info(f"Timestamp: {timestamp}")
-        logger.info(f"Media URLs: {media}")
-        
-        return result
-        
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Network error while fetching tweet: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"Unexpected error while scraping tweet: {e}")
-        return None
+        for tag, attrs in meta_selectors:
+            element = soup.find(tag, attrs)
+            if element:
+                src = element.get('content', '')
+                if is_valid_media_url(src):
+                    if src.startswith('//'):
+                        src = 'https:' + src
+                    media.append(src)
+    
+    # Remove duplicates while preserving order
+    media = list(dict.fromkeys(media))
+    
+    result = {
+        "text": tweet_text,
+        "author": author,
+        "username": username,
+        "timestamp": timestamp,
+        "media": media
+    }
+    
+    logger.info("Successfully extracted tweet data:")
+    logger.info(f"Author: {author}")
+    logger.info(f"Username: {username}")
+    logger.info(f"Timestamp: {timestamp}")
+    logger.info(f"Media URLs: {media}")
+    
+    return result
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -0,0 +1,17 @@
+"""The app wired to an in-memory Firestore, for serving under gunicorn in load tests.
+
+    gunicorn benchmarks.bench_app:app
+"""
+import os
+import tempfile
+
+from benchmarks.run import bench_board_collection, configure_bench_app, load_app
+
+BENCH_CATEGORY_ID = 'bench'
+
+app_module = load_app()
+db = configure_bench_app(app_module, media_folder=tempfile.mkdtemp(prefix='bench-media-'),
+                         users=int(os.getenv('BENCH_USERS', '1')))
+bench_board_collection(db, 'categories').document(BENCH_CATEGORY_ID).set({'name': 'Benchmark', 'position': 0})
+
+app = app_module.app
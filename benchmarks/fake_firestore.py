@@ -0,0 +1,256 @@
+"""In-memory stand-in for the Firestore client used by the benchmarks.
+
+Only the subset of the API that app.py touches is implemented: collections,
+documents, equality and array-contains filters, ordering, limits, cursors and write batches.
+Outages, slow calls and random errors can be injected through `Faults`.
+"""
+import copy
+import random
+import threading
+import time
+import uuid
+
+from google.api_core.exceptions import DeadlineExceeded, NotFound, ServiceUnavailable
+from google.cloud.firestore_v1.transforms import DELETE_FIELD, ArrayUnion, Increment
+
+
+class Faults:
+    """Failures injected into every call a FakeFirestore makes; change them at any time.
+
+    down: every call fails with ServiceUnavailable.
+    latency: seconds each call takes; a call with a shorter timeout raises
+        DeadlineExceeded once its timeout has passed.
+    error_rate: fraction of calls that fail with ServiceUnavailable.
+    """
+
+    def __init__(self, down=False, latency=0.0, error_rate=0.0, seed=None):
+        self.down = down
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def before_call(self, timeout=None):
+        with self._lock:
+            self.calls += 1
+            fail = self.down or self._random.random() < self.error_rate
+            if fail:
+                self.failures += 1
+        if fail:
+            raise ServiceUnavailable("Injected outage")
+        if self.latency:
+            if timeout is not None and timeout < self.latency:
+                time.sleep(timeout)
+                with self._lock:
+                    self.failures += 1
+                raise DeadlineExceeded("Injected latency exceeded the deadline")
+            time.sleep(self.latency)
+
+
+def _apply(existing, changes):
+    """Merge changes into a document, resolving Increment, ArrayUnion and DELETE_FIELD"""
+    for field, value in changes.items():
+        if value is DELETE_FIELD:
+            existing.pop(field, None)
+            continue
+        if isinstance(value, Increment):
+            value = existing.get(field, 0) + value.value
+        elif isinstance(value, ArrayUnion):
+            current = list(existing.get(field) or [])
+            value = current + [item for item in value.values if item not in current]
+        existing[field] = copy.deepcopy(value)
+
+
+def _matches(data, field, op, value):
+    if op == 'array_contains':
+        return value in (data.get(field) or [])
+    return data.get(field) == value
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class FakeDocumentReference:
+    def __init__(self, client, path, doc_id):
+        self._client = client
+        self._path = path
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._path}/{self.id}"
+
+    def collection(self, name):
+        return FakeCollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, retry=None, timeout=None):
+        self._client.faults.before_call(timeout)
+        with self._client._lock:
+            data = self._client._docs(self._path).get(self.id)
+            return FakeSnapshot(self, copy.deepcopy(data))
+
+    def set(self, data, merge=False, retry=None, timeout=None):
+        self._client.faults.before_call(timeout)
+        self._set(data, merge)
+
+    def update(self, data, retry=None, timeout=None):
+        self._client.faults.before_call(timeout)
+        self._update(data)
+
+    def delete(self, retry=None, timeout=None):
+        self._client.faults.before_call(timeout)
+        self._delete()
+
+    def _set(self, data, merge=False):
+        with self._client._lock:
+            docs = self._client._docs(self._path)
+            if not (merge and self.id in docs):
+                docs[self.id] = {}
+            _apply(docs[self.id], data)
+
+    def _update(self, data):
+        with self._client._lock:
+            docs = self._client._docs(self._path)
+            if self.id not in docs:
+                raise NotFound(f"No document to update: {self.path}")
+            _apply(docs[self.id], data)
+
+    def _delete(self):
+        with self._client._lock:
+            self._client._docs(self._path).pop(self.id, None)
+
+
+class FakeQuery:
+    def __init__(self, client, path, filters=(), orders=(), limit=None, cursor=None):
+        self._client = client
+        self._path = path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, orders=self._orders,
+                     limit=self._limit, cursor=self._cursor)
+        state.update(changes)
+        return FakeQuery(self._client, self._path, **state)
+
+    def where(self, field, op, value):
+        if op not in ('==', 'array_contains'):
+            raise NotImplementedError(f"Unsupported operator: {op}")
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field, direction=None):
+        descending = str(direction).upper().endswith('DESCENDING')
+        return self._copy(orders=self._orders + ((field, descending),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, cursor):
+        # Accepts a snapshot or a {'__name__': document_reference} mapping
+        if isinstance(cursor, dict):
+            return self._copy(cursor=cursor['__name__'].id)
+        return self._copy(cursor=cursor.id)
+
+    def stream(self, retry=None, timeout=None):
+        self._client.faults.before_call(timeout)
+        with self._client._lock:
+            items = [
+                (doc_id, copy.deepcopy(data))
+                for doc_id, data in self._client._docs(self._path).items()
+                if all(_matches(data, field, op, value) for field, op, value in self._filters)
+            ]
+        # Documents missing an ordered field are excluded, as in Firestore
+        for field, descending in reversed(self._orders):
+            if field != '__name__':
+                items = [item for item in items if field in item[1]]
+            items.sort(key=lambda item: item[0] if field == '__name__' else item[1][field],
+                       reverse=descending)
+        if not self._orders:
+            items.sort(key=lambda item: item[0])
+        if self._cursor is not None:
+            ids = [doc_id for doc_id, _ in items]
+            items = items[ids.index(self._cursor) + 1:] if self._cursor in ids else []
+        if self._limit is not None:
+            items = items[:self._limit]
+        for doc_id, data in items:
+            ref = FakeDocumentReference(self._client, self._path, doc_id)
+            yield FakeSnapshot(ref, data)
+
+    def get(self, retry=None, timeout=None):
+        return list(self.stream(timeout=timeout))
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+
+    @property
+    def id(self):
+        return self._path.rsplit('/', 1)[-1]
+
+    def document(self, doc_id=None):
+        return FakeDocumentReference(self._client, self._path, doc_id or uuid.uuid4().hex[:20])
+
+
+class FakeWriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, reference, data, merge=False):
+        self._ops.append(lambda: reference._set(data, merge=merge))
+
+    def update(self, reference, data):
+        self._ops.append(lambda: reference._update(data))
+
+    def delete(self, reference):
+        self._ops.append(reference._delete)
+
+    def commit(self, retry=None, timeout=None):
+        """Apply every write or, like Firestore, none of them if one fails"""
+        self._client.faults.before_call(timeout)
+        with self._client._lock:
+            saved = copy.deepcopy(self._client._collections)
+            try:
+                for op in self._ops:
+                    op()
+            except Exception:
+                self._client._collections = saved
+                raise
+        self._ops = []
+
+
+class FakeFirestore:
+    """Thread-safe in-memory Firestore client"""
+
+    def __init__(self, faults=None):
+        self._lock = threading.RLock()
+        self._collections = {}
+        self.faults = faults or Faults()
+
+    def _docs(self, path):
+        return self._collections.setdefault(path, {})
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
@@ -0,0 +1,218 @@
+"""Load tests for the serving modes and for ingest admission control.
+
+Concurrent clients mix board reads (GET /) with tweet submissions
+(POST /add_tweet) whose scrapes go to the replay server.
+
+By default gunicorn's sync and gthread workers are compared on
+requests/sec and latency percentiles. With --flood, most clients (each its
+own user) hammer /add_tweet while the rest read the board, and read latency is compared between a reads-only baseline and a
+flood with admission control off and on.
+
+Usage:
+    python -m benchmarks.load_test --clients 50 --duration 20 --latency 0.5
+    python -m benchmarks.load_test --flood --mode gthread --writers 40
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from benchmarks.bench_app import BENCH_CATEGORY_ID
+from benchmarks.replay_server import ReplayServer
+from benchmarks.run import RESULTS_DIR, auth_headers, bench_username
+
+logger = logging.getLogger(__name__)
+
+MODES = {
+    'wsgi': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--worker-class', 'sync',
+        '--bind', f'127.0.0.1:{port}', 'benchmarks.bench_app:app'],
+    'gthread': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--worker-class', 'gthread',
+        '--threads', '32', '--bind', f'127.0.0.1:{port}', 'benchmarks.bench_app:app'],
+}
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+
+def start_server(mode, port, workers, env=None):
+    """Launch a server process for a mode and wait until it answers"""
+    server_env = dict(os.environ, SCRAPE_DELAY='0', ADMISSION_CONTROL='0')
+    server_env.update(env or {})
+    process = subprocess.Popen(MODES[mode](port, workers), env=server_env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/', timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{mode} server did not start on port {port}")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_load(base_url, tweet_urls, clients, duration, write_ratio, writers=None):
+    """Drive the server with concurrent clients and return latency statistics.
+
+    Each client issues a write with probability write_ratio, otherwise a read.
+    If writers is given, that many clients only write, each as its own user,
+    and the rest only read.
+    """
+    samples = {'read': [], 'write': []}
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        session = requests.Session()
+        user = bench_username(index + 1) if writers is not None and index < writers else bench_username(1)
+        session.headers.update(auth_headers(user))
+        while time.monotonic() < deadline:
+            if writers is not None:
+                write = index < writers
+            else:
+                write = random.random() < write_ratio
+            start = time.perf_counter()
+            try:
+                if write:
+                    response = session.post(f'{base_url}/add_tweet', allow_redirects=False, timeout=60, data={
+                        'tweet_url': random.choice(tweet_urls),
+                        'category_id': BENCH_CATEGORY_ID,
+                    })
+                else:
+                    response = session.get(f'{base_url}/', timeout=60)
+                status = response.status_code
+            except requests.RequestException:
+                status = 'error'
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples['write' if write else 'read'].append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = len(samples['read']) + len(samples['write'])
+    result = {
+        'requests_per_sec': total / elapsed,
+        'p50_ms': percentile(samples['read'] + samples['write'], 0.50),
+        'p99_ms': percentile(samples['read'] + samples['write'], 0.99),
+        'statuses': {str(status): count for status, count in statuses.items()},
+    }
+    for kind, kind_samples in samples.items():
+        result[f'{kind}_count'] = len(kind_samples)
+        result[f'{kind}_p50_ms'] = percentile(kind_samples, 0.50)
+        result[f'{kind}_p99_ms'] = percentile(kind_samples, 0.99)
+    return result
+
+
+def run_modes(args, tweet_urls):
+    results = {}
+    for mode in args.mode or list(MODES):
+        logger.info(f"Load testing {mode} with {args.clients} clients for {args.duration}s")
+        process = start_server(mode, args.port, args.workers)
+        try:
+            results[mode] = run_load(f'http://127.0.0.1:{args.port}', tweet_urls,
+                                     args.clients, args.duration, args.write_ratio)
+        finally:
+            stop_server(process)
+
+    print(f"{'mode':<6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'read p99':>9} {'write p99':>10}")
+    for mode, result in results.items():
+        print(f"{mode:<6} {result['requests_per_sec']:>8.1f} {result['p50_ms']:>8.1f} "
+              f"{result['p99_ms']:>8.1f} {result['read_p99_ms'] or 0:>9.1f} {result['write_p99_ms'] or 0:>10.1f}")
+    return results
+
+
+def run_flood(args, tweet_urls):
+    mode = (args.mode or ['gthread'])[0]
+    phases = [
+        ('baseline', 0, {}),
+        ('flood_unlimited', args.writers, {'ADMISSION_CONTROL': '0'}),
+        ('flood_admission', args.writers, {'ADMISSION_CONTROL': '1'}),
+    ]
+    results = {}
+    for name, writers, env in phases:
+        logger.info(f"Flood test {name} on {mode}: {writers} writers, {args.clients - writers} readers")
+        env = dict(env, BENCH_USERS=str(max(1, writers)))
+        process = start_server(mode, args.port, args.workers, env=env)
+        try:
+            results[name] = run_load(f'http://127.0.0.1:{args.port}', tweet_urls,
+                                     args.clients, args.duration, 0, writers=writers)
+        finally:
+            stop_server(process)
+
+    print(f"{'phase':<16} {'read p50':>9} {'read p99':>9} {'writes':>7} {'429s':>6}")
+    for name, result in results.items():
+        print(f"{name:<16} {result['read_p50_ms'] or 0:>9.1f} {result['read_p99_ms'] or 0:>9.1f} "
+              f"{result['write_count']:>7} {result['statuses'].get('429', 0):>6}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', action='append', choices=sorted(MODES),
+                        help='serving mode to test; may be repeated (default: all)')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds per mode')
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='fraction of requests that add tweets')
+    parser.add_argument('--workers', type=int, default=2, help='server worker processes')
+    parser.add_argument('--latency', type=float, default=0.5, help='replay server latency in seconds')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--flood', action='store_true',
+                        help='measure read latency during an ingest flood instead of comparing modes')
+    parser.add_argument('--writers', type=int, default=40, help='flooding clients with --flood')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/load-<timestamp>.json)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'settings': {key: getattr(args, key) for key in
+                     ('clients', 'duration', 'write_ratio', 'workers', 'latency', 'flood', 'writers')},
+    }
+    with ReplayServer(latency=args.latency) as replay:
+        tweet_urls = [url for url, _ in replay.pages()]
+        if args.flood:
+            results['flood'] = run_flood(args, tweet_urls)
+        else:
+            results['modes'] = run_modes(args, tweet_urls)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, 'load-' + datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ') + '.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+    logger.info(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""Local HTTP server that replays the recorded tweet corpus.
+
+Pages and media listed in corpus/manifest.json are served from disk with
+optional latency, bandwidth throttling and injected errors, so the scraping
+path can be exercised without touching Twitter.
+
+Usage:
+    python -m benchmarks.replay_server serve --port 8765 --latency 0.2
+    python -m benchmarks.replay_server record https://x.com/user/status/123
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+BASE_URL_PLACEHOLDER = '{{base_url}}'
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.mp4': 'video/mp4',
+}
+
+
+def load_manifest(corpus_dir=CORPUS_DIR):
+    with open(os.path.join(corpus_dir, 'manifest.json')) as f:
+        return json.load(f)
+
+
+def expand_base_url(value, base_url):
+    """Replace the base URL placeholder in a string, list or dict"""
+    if isinstance(value, str):
+        return value.replace(BASE_URL_PLACEHOLDER, base_url)
+    if isinstance(value, list):
+        return [expand_base_url(item, base_url) for item in value]
+    if isinstance(value, dict):
+        return {key: expand_base_url(item, base_url) for key, item in value.items()}
+    return value
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug("replay: " + format, *args)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        server = self.server
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        server.record_request(parsed.path)
+
+        # Per-request overrides: ?delay=0.5&status=503
+        delay = float(query.get('delay', [server.latency])[0])
+        if server.jitter:
+            delay += random.uniform(0, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        status = int(query.get('status', [0])[0])
+        if not status and server.error_rate and random.random() < server.error_rate:
+            status = server.error_status
+        if status and status >= 400:
+            self._send(status, b'injected error', 'text/plain', send_body)
+            return
+
+        body, content_type = server.lookup(parsed.path)
+        if body is None:
+            self._send(404, b'not found', 'text/plain', send_body)
+            return
+        self._send(200, body, content_type, send_body)
+
+    def _send(self, status, body, content_type, send_body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not send_body:
+            return
+
+        bandwidth = self.server.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+
+        # Throttle by writing fixed-size chunks and sleeping between them
+        chunk_size = max(1, min(len(body), int(bandwidth) // 10 or 1))
+        for start in range(0, len(body), chunk_size):
+            self.wfile.write(body[start:start + chunk_size])
+            self.wfile.flush()
+            time.sleep(chunk_size / bandwidth)
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Threaded replay server; use as a context manager to run it in the background"""
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, corpus_dir=CORPUS_DIR, latency=0.0,
+                 jitter=0.0, bandwidth=None, error_rate=0.0, error_status=503):
+        super().__init__((host, port), ReplayHandler)
+        self.corpus_dir = corpus_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.manifest = load_manifest(corpus_dir)
+        self.request_counts = {}
+        self._counts_lock = threading.Lock()
+        self._thread = None
+        self._bodies = {}
+        self._load_bodies()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _load_bodies(self):
+        for page in self.manifest.get('pages', []):
+            with open(os.path.join(self.corpus_dir, page['file']), encoding='utf-8') as f:
+                html = expand_base_url(f.read(), self.base_url)
+            self._bodies[page['path']] = (html.encode('utf-8'), CONTENT_TYPES['.html'])
+        for path, filename in self.manifest.get('media', {}).items():
+            with open(os.path.join(self.corpus_dir, filename), 'rb') as f:
+                content_type = CONTENT_TYPES.get(os.path.splitext(filename)[1].lower(),
+                                                 'application/octet-stream')
+                self._bodies[path] = (f.read(), content_type)
+
+    def lookup(self, path):
+        return self._bodies.get(path, (None, None))
+
+    def record_request(self, path):
+        with self._counts_lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+    def pages(self):
+        """Yield (url, expected parse result) for every recorded page"""
+        for page in self.manifest.get('pages', []):
+            yield self.base_url + page['path'], expand_base_url(page['expected'], self.base_url)
+
+    def media_urls(self):
+        return [self.base_url + path for path in self.manifest.get('media', {})]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def record(url, corpus_dir=CORPUS_DIR):
+    """Fetch a live tweet page and its media into the corpus"""
+    import requests
+    from app import SCRAPE_HEADERS, parse_tweet_html
+
+    response = requests.get(url, headers=SCRAPE_HEADERS, timeout=10)
+    response.raise_for_status()
+    html = response.text
+    result = parse_tweet_html(html)
+
+    manifest = load_manifest(corpus_dir)
+    for media_url in result['media']:
+        media_response = requests.get(media_url, timeout=10)
+        if media_response.status_code != 200:
+            logger.warning(f"Skipping media {media_url}: HTTP {media_response.status_code}")
+            continue
+        digest = hashlib.sha256(media_response.content).hexdigest()[:16]
+        extension = os.path.splitext(urlparse(media_url).path)[1] or '.jpg'
+        filename = f"media/{digest}{extension}"
+        with open(os.path.join(corpus_dir, filename), 'wb') as f:
+            f.write(media_response.content)
+        local_path = f"/media/{digest}{extension}"
+        manifest['media'][local_path] = filename
+        html = html.replace(media_url, BASE_URL_PLACEHOLDER + local_path)
+
+    path = urlparse(url).path
+    page_file = f"pages/{path.strip('/').replace('/', '_')}.html"
+    with open(os.path.join(corpus_dir, page_file), 'w', encoding='utf-8') as f:
+        f.write(html)
+
+    manifest['pages'] = [page for page in manifest['pages'] if page['path'] != path]
+    manifest['pages'].append({
+        'path': path,
+        'file': page_file,
+        'expected': parse_tweet_html(html),
+    })
+    with open(os.path.join(corpus_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    logger.info(f"Recorded {url} as {page_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='serve the corpus')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    serve_parser.add_argument('--jitter', type=float, default=0.0, help='random extra latency, in seconds')
+    serve_parser.add_argument('--bandwidth', type=float, default=None, help='bytes per second per response')
+    serve_parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests that fail')
+    serve_parser.add_argument('--error-status', type=int, default=503)
+
+    record_parser = subparsers.add_parser('record', help='record a live tweet into the corpus')
+    record_parser.add_argument('urls', nargs='+')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'record':
+        for url in args.urls:
+            record(url)
+        return
+
+    server = ReplayServer(host=args.host, port=args.port, latency=args.latency,
+                          jitter=args.jitter, bandwidth=args.bandwidth,
+                          error_rate=args.error_rate, error_status=args.error_status)
+    logger.info(f"Replaying {len(server.manifest['pages'])} pages at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
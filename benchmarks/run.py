@@ -0,0 +1,443 @@
+"""Offline benchmarks for the scraping and ingest path.
+
+Runs against the local replay server and an in-memory Firestore, so no
+network access or Firebase credentials are needed. Results are written to
+benchmarks/results/ as JSON and can be compared against an earlier run.
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --scenario parse --scenario scrape --latency 0.05
+    python -m benchmarks.run --compare benchmarks/results/baseline.json
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from werkzeug.security import generate_password_hash
+
+from benchmarks.fake_firestore import FakeFirestore, Faults
+from benchmarks.replay_server import CORPUS_DIR, ReplayServer
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+BENCH_USERNAME = 'bench'
+BENCH_PASSWORD = 'bench'
+BENCH_BOARD_ID = 'default'
+
+SCENARIOS = {}
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+def load_app():
+    """Import the Flask app with quiet logging"""
+    import app as app_module
+    logging.getLogger(app_module.__name__).setLevel(logging.WARNING)
+    return app_module
+
+
+def summarize(samples):
+    """Summary statistics for a list of durations in seconds, in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_ms': statistics.mean(ordered) * 1000,
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def auth_headers(username=BENCH_USERNAME, password=BENCH_PASSWORD):
+    token = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return {'Authorization': f'Basic {token}'}
+
+
+def bench_username(number):
+    return BENCH_USERNAME if number == 1 else f'{BENCH_USERNAME}{number}'
+
+
+def configure_bench_app(app_module, db=None, media_folder=None, users=1):
+    """Point the app at an in-memory Firestore and benchmark users bench, bench2, ...
+    
+    Every benchmark user is a member of the BENCH_BOARD_ID board.
+    """
+    app_module.db = db or FakeFirestore()
+    # A single hash iteration keeps password checks out of the measurements
+    password_hash = generate_password_hash(BENCH_PASSWORD, method='pbkdf2:sha256:1')
+    app_module.app.config['SCRAPE_DELAY'] = 0
+    for number in range(1, users + 1):
+        app_module.app.config[f'BASIC_AUTH_USERNAME{number}'] = bench_username(number)
+        app_module.app.config[f'BASIC_AUTH_PASSWORD_HASH{number}'] = password_hash
+    if media_folder:
+        app_module.MEDIA_FOLDER = media_folder
+    app_module.db.collection('boards').document(BENCH_BOARD_ID).set({
+        'name': 'Benchmark',
+        'members': [bench_username(number) for number in range(1, users + 1)],
+    })
+    app_module.invalidate_membership_cache()
+    return app_module.db
+
+
+def bench_board_collection(db, name):
+    return db.collection('boards').document(BENCH_BOARD_ID).collection(name)
+
+
+@scenario
+def corpus(server, args):
+    """Check every recorded page still parses to its expected result"""
+    app_module = load_app()
+    mismatches = []
+    for url, expected in server.pages():
+        result = app_module.scrape_tweet(url)
+        if result != expected:
+            mismatches.append({'url': url, 'expected': expected, 'actual': result})
+    for mismatch in mismatches:
+        logger.error(f"Corpus regression for {mismatch['url']}: "
+                     f"expected {mismatch['expected']}, got {mismatch['actual']}")
+    return {'pages': len(list(server.pages())), 'mismatches': len(mismatches)}
+
+
+@scenario
+def parse(server, args):
+    """Time parse_tweet_html on every recorded page, without network I/O"""
+    app_module = load_app()
+    pages = []
+    for page in server.manifest['pages']:
+        with open(os.path.join(CORPUS_DIR, page['file']), encoding='utf-8') as f:
+            pages.append(f.read())
+
+    samples = []
+    for _ in range(args.iterations):
+        for html in pages:
+            start = time.perf_counter()
+            app_module.parse_tweet_html(html)
+            samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+@scenario
+def scrape(server, args):
+    """Time scrape_tweet end to end against the replay server"""
+    app_module = load_app()
+    urls = [url for url, _ in server.pages()]
+    samples = []
+    for _ in range(args.iterations):
+        for url in urls:
+            start = time.perf_counter()
+            app_module.scrape_tweet(url)
+            samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+@scenario
+def memory(server, args):
+    """Peak traced memory while scraping and downloading media for the corpus"""
+    app_module = load_app()
+    with tempfile.TemporaryDirectory() as media_folder:
+        configure_bench_app(app_module, media_folder=media_folder)
+        tracemalloc.start()
+        try:
+            for url, _ in server.pages():
+                tweet_data = app_module.scrape_tweet(url)
+                for media_url in (tweet_data or {}).get('media', []):
+                    app_module.download_media(media_url)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {'peak_kib': peak / 1024}
+
+
+@scenario
+def media(server, args):
+    """Latency of fetching 1-4 media files sequentially and with download_all_media"""
+    app_module = load_app()
+    media_urls = server.media_urls()
+    result = {}
+    with tempfile.TemporaryDirectory() as media_folder:
+        configure_bench_app(app_module, media_folder=media_folder)
+        for count in range(1, min(4, len(media_urls)) + 1):
+            sequential, concurrent = [], []
+            for iteration in range(args.iterations):
+                # A unique query string defeats the on-disk media cache
+                urls = [f"{url}?delay={args.media_delay}&i={iteration}-{count}-{mode}"
+                        for mode in ('seq', 'par') for url in media_urls[:count]]
+                start = time.perf_counter()
+                for url in urls[:count]:
+                    app_module.download_media(url)
+                sequential.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                app_module.download_all_media(urls[count:])
+                concurrent.append(time.perf_counter() - start)
+            result[f'sequential_{count}_p50_ms'] = summarize(sequential)['p50_ms']
+            result[f'concurrent_{count}_p50_ms'] = summarize(concurrent)['p50_ms']
+    return result
+
+
+@scenario
+def render(server, args):
+    """Board render time with an empty and a warm tweet fragment cache"""
+    app_module = load_app()
+    configure_bench_app(app_module)
+    per_category = max(1, args.board_tweets // 10)
+    categories = [{
+        'id': f'category-{c}',
+        'name': f'Category {c}',
+        'position': c,
+        'tweets': [{
+            'id': f'tweet-{c}-{t}',
+            'tweet_text': f'Benchmark tweet {t} in category {c} ' * 4,
+            'author': 'Bench Author',
+            'username': 'bench',
+            'timestamp': '2024-01-01T00:00:00.000Z',
+            'media_urls': ','.join(f'/static/media/{c}-{t}-{m}' for m in range(t % 4)) or None,
+            'category': f'category-{c}',
+            'original_url': f'https://x.com/bench/status/{c}{t}',
+            'added_by': BENCH_USERNAME,
+        } for t in range(per_category)],
+    } for c in range(10)]
+
+    cold, warm = [], []
+    with app_module.app.test_request_context('/'):
+        app_module.g.board_id = BENCH_BOARD_ID
+        for _ in range(args.iterations):
+            app_module.tweet_fragment_caches.clear()
+            start = time.perf_counter()
+            app_module.render_board(categories)
+            cold.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            app_module.render_board(categories)
+            warm.append(time.perf_counter() - start)
+    return {
+        'tweets': per_category * 10,
+        'cold_p50_ms': summarize(cold)['p50_ms'],
+        'warm_p50_ms': summarize(warm)['p50_ms'],
+    }
+
+
+@scenario
+def add_tweet(server, args):
+    """Throughput of POST /add_tweet through the Flask test client"""
+    app_module = load_app()
+    # Rate limits would reject most of the submissions; load_test --flood measures them
+    app_module.app.config['ADMISSION_CONTROL'] = False
+    with tempfile.TemporaryDirectory() as media_folder:
+        db = configure_bench_app(app_module, media_folder=media_folder)
+        category_ref = bench_board_collection(db, 'categories').document()
+        category_ref.set({'name': 'Benchmark', 'position': 0})
+
+        client = app_module.app.test_client()
+        headers = auth_headers()
+        urls = [url for url, _ in server.pages()]
+        samples = []
+        failures = 0
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            for url in urls:
+                start = time.perf_counter()
+                response = client.post('/add_tweet', headers=headers, data={
+                    'tweet_url': url,
+                    'category_id': category_ref.id,
+                })
+                samples.append(time.perf_counter() - start)
+                if response.status_code != 302:
+                    failures += 1
+        elapsed = time.perf_counter() - started
+
+    result = summarize(samples)
+    result.update(requests_per_sec=len(samples) / elapsed, failures=failures)
+    return result
+
+
+@scenario
+def outage(server, args):
+    """Board reads and writes while Firestore is slow, then down, then recovers"""
+    app_module = load_app()
+    from resilience import CircuitBreaker, SnapshotStore, WriteQueue
+
+    faults = Faults()
+    db = configure_bench_app(app_module, db=FakeFirestore(faults=faults))
+    categories = bench_board_collection(db, 'categories')
+    for c in range(5):
+        categories.document(f'category-{c}').set({'name': f'Category {c}', 'position': c})
+        for t in range(20):
+            bench_board_collection(db, 'tweets').document(f'tweet-{c}-{t}').set({
+                'tweet_text': f'Outage tweet {t}', 'author': 'Bench Author', 'username': 'bench',
+                'timestamp': '2024-01-01T00:00:00.000Z', 'media_urls': None,
+                'category': f'category-{c}', 'original_url': f'https://x.com/bench/status/{c}{t}',
+            })
+
+    reset_timeout = 0.5
+    client = app_module.app.test_client()
+    headers = auth_headers()
+
+    def timed_get(path):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        return time.perf_counter() - start, response
+
+    with tempfile.TemporaryDirectory() as folder:
+        app_module.board_snapshots = SnapshotStore(os.path.join(folder, 'snapshots'),
+                                                   app_module.app.config['SNAPSHOT_INTERVAL'])
+        app_module.write_queue = WriteQueue(os.path.join(folder, 'write-queue.ndjson'))
+        app_module.firestore_breaker = CircuitBreaker(3, reset_timeout)
+        app_module.FIRESTORE_DEADLINE['timeout'] = args.firestore_deadline
+
+        healthy = [timed_get('/')[0] for _ in range(args.iterations)]
+
+        # Every call outlives its deadline until the breaker opens
+        faults.latency = args.firestore_deadline * 10
+        slow, served = [], 0
+        for _ in range(args.iterations):
+            elapsed, response = timed_get('/')
+            slow.append(elapsed)
+            served += response.status_code == 200
+
+        faults.latency = 0
+        faults.down = True
+        queued = 0
+        for number in range(args.iterations):
+            response = client.post('/add_category', headers=headers, data={'name': f'Queued {number}'})
+            queued += response.status_code == 302
+        api_elapsed, api_response = timed_get('/api/v1/board?include=tweets')
+
+        faults.down = False
+        time.sleep(reset_timeout)
+        started = time.perf_counter()
+        timed_get('/')
+        deadline = time.monotonic() + 30
+        while app_module.write_queue.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        recovery = time.perf_counter() - started
+
+    replayed = sorted((doc.to_dict() for doc in categories.stream()
+                       if doc.to_dict()['name'].startswith('Queued')), key=lambda c: c['position'])
+    problems = []
+    if served < args.iterations:
+        problems.append(f"only {served} of {args.iterations} slow reads were served from the snapshot")
+    if api_response.status_code != 200:
+        problems.append(f"the API answered {api_response.status_code} from the snapshot")
+    if queued < args.iterations:
+        problems.append(f"only {queued} of {args.iterations} writes were queued")
+    if len(replayed) != queued:
+        problems.append(f"{len(replayed)} of {queued} queued writes were replayed")
+    if [c['name'] for c in replayed] != [f'Queued {number}' for number in range(len(replayed))]:
+        problems.append("queued writes were replayed out of order")
+    for problem in problems:
+        logger.error(f"Outage: {problem}")
+    return {
+        'healthy_p50_ms': summarize(healthy)['p50_ms'],
+        'slow_p50_ms': summarize(slow)['p50_ms'],
+        'slow_max_ms': summarize(slow)['max_ms'],
+        'slow_served_from_snapshot': served,
+        'api_snapshot_ms': api_elapsed * 1000,
+        'api_snapshot_status': api_response.status_code,
+        'writes_queued': queued,
+        'writes_replayed': len(replayed),
+        'recovery_ms': recovery * 1000,
+        'problems': len(problems),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Print metric deltas against a baseline run and return the regressions"""
+    regressions = []
+    for name, metrics in current['scenarios'].items():
+        for metric, value in metrics.items():
+            old = baseline.get('scenarios', {}).get(name, {}).get(metric)
+            if not isinstance(value, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            # Throughput is better when higher, everything else when lower
+            worse = -change if metric.endswith('_per_sec') else change
+            flag = ''
+            if worse > threshold and metric not in ('count', 'pages', 'tweets', 'api_snapshot_status',
+                                                    'slow_served_from_snapshot', 'writes_queued',
+                                                    'writes_replayed', 'problems'):
+                regressions.append(f"{name}.{metric}")
+                flag = '  <-- regression'
+            print(f"{name}.{metric}: {old:.3f} -> {value:.3f} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario to run; may be repeated (default: all)')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.0, help='replay server latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--bandwidth', type=float, default=None, help='replay server bytes/sec')
+    parser.add_argument('--media-delay', type=float, default=0.2,
+                        help='per-file delay for the media scenario, in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--board-tweets', type=int, default=2000, help='board size for the render scenario')
+    parser.add_argument('--firestore-deadline', type=float, default=0.1,
+                        help='Firestore call deadline for the outage scenario, in seconds')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative slowdown reported as a regression')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'settings': {key: getattr(args, key) for key in
+                     ('iterations', 'latency', 'jitter', 'bandwidth', 'error_rate', 'media_delay', 'board_tweets',
+                      'firestore_deadline')},
+        'scenarios': {},
+    }
+
+    with ReplayServer(latency=args.latency, jitter=args.jitter, bandwidth=args.bandwidth,
+                      error_rate=args.error_rate) as server:
+        for name in args.scenario or list(SCENARIOS):
+            logger.info(f"Running {name}")
+            results['scenarios'][name] = SCENARIOS[name](server, args)
+            logger.info(f"{name}: {results['scenarios'][name]}")
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ') + '.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+    logger.info(f"Results written to {output}")
+
+    failed = (results['scenarios'].get('corpus', {}).get('mismatches', 0) > 0
+              or results['scenarios'].get('outage', {}).get('problems', 0) > 0)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            logger.error(f"Regressions: {', '.join(regressions)}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+"""Export and import a board as a single streaming archive.
+
+The archive is a sequence of compressed members (gzip, zstd or none), each
+holding newline-delimited JSON records. Categories and tweets are read from
+Firestore one page at a time and every page is flushed as its own member,
+or sooner once its buffered records reach MAX_MEMBER_BYTES, so memory
+stays constant and an interrupted export can be resumed by truncating the
+file back to the last complete member. Local media files are stored once
+as content-addressed blobs keyed by their SHA-256.
+
+Usage:
+    python board_archive.py export board.ndjson.gz
+    python board_archive.py export board.ndjson.zst --compression zstd --resume
+    python board_archive.py import board.ndjson.gz
+    python board_archive.py export team.ndjson.gz --board <board_id>
+    python board_archive.py import team.ndjson.gz --board <new_board_id>
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from board_store import BATCH_SIZE, LOCAL_MEDIA_PREFIX, board_ref, pages
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMAT = 'grokkytweet-board'
+ARCHIVE_VERSION = 1
+COLLECTIONS = ('categories', 'tweets')
+DEFAULT_BOARD_ID = 'default'
+DEFAULT_PAGE_SIZE = 500
+# Buffered records are flushed as a member once they reach this size, so a
+# page full of media never has to be held in memory at once
+MAX_MEMBER_BYTES = 4 * 1024 * 1024
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Cannot archive value of type {type(value).__name__}")
+
+
+def _decode_object(obj):
+    if len(obj) == 1 and '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+def _compress(data, compression):
+    if compression == 'gzip':
+        return gzip.compress(data)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def _open_reader(path):
+    """Open an archive for line-by-line reading, detecting its compression"""
+    f = open(path, 'rb')
+    magic = f.read(4)
+    f.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=f)
+    if magic.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            f.close()
+            raise RuntimeError("Reading a zstd archive requires the zstandard package")
+        reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=True)
+        return io.BufferedReader(reader)
+    return f
+
+
+def _checkpoint_path(path, operation):
+    return f"{path}.{operation}-checkpoint"
+
+
+def _load_checkpoint(path, operation):
+    try:
+        with open(_checkpoint_path(path, operation)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_checkpoint(path, operation, state):
+    checkpoint = _checkpoint_path(path, operation)
+    with open(checkpoint + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(checkpoint + '.tmp', checkpoint)
+
+
+def _clear_checkpoint(path, operation):
+    try:
+        os.remove(_checkpoint_path(path, operation))
+    except FileNotFoundError:
+        pass
+
+
+def _report(operation, stats, elapsed):
+    elapsed = max(elapsed, 1e-9)
+    stats['seconds'] = round(elapsed, 3)
+    stats['docs_per_sec'] = round(stats['docs'] / elapsed, 1)
+    stats['mb_per_sec'] = round(stats['bytes'] / elapsed / 1e6, 3)
+    logger.info(f"{operation}: {stats['docs']} docs, {stats['blobs']} blobs, "
+                f"{stats['bytes'] / 1e6:.2f} MB in {elapsed:.1f}s "
+                f"({stats['docs_per_sec']} docs/sec, {stats['mb_per_sec']} MB/sec)")
+    return stats
+
+
+class _MemberWriter:
+    """Buffers records and appends them to the archive as one compressed member"""
+
+    def __init__(self, f, compression):
+        self._f = f
+        self._compression = compression
+        self._lines = []
+        self.buffered = 0
+
+    def add(self, record):
+        line = json.dumps(record, default=_encode_value, separators=(',', ':'))
+        self._lines.append(line)
+        self.buffered += len(line) + 1
+
+    def flush(self):
+        if not self._lines:
+            return 0
+        data = _compress(('\n'.join(self._lines) + '\n').encode('utf-8'), self._compression)
+        self._lines = []
+        self.buffered = 0
+        self._f.write(data)
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return len(data)
+
+
+def _media_blob(url, media_folder):
+    """Read a locally stored media file, returning (sha256, bytes) or None"""
+    if not url or not url.startswith(LOCAL_MEDIA_PREFIX):
+        return None
+    file_path = os.path.join(media_folder, os.path.basename(url))
+    try:
+        with open(file_path, 'rb') as f:
+            content = f.read()
+    except OSError:
+        logger.warning(f"Media file missing, exporting URL only: {file_path}")
+        return None
+    return hashlib.sha256(content).hexdigest(), content
+
+
+def export_board(db, path, media_folder, compression='gzip', page_size=DEFAULT_PAGE_SIZE,
+                 resume=False, board_id=DEFAULT_BOARD_ID):
+    """Stream a board's categories and tweets, plus local media, into an archive"""
+    checkpoint = _load_checkpoint(path, 'export') if resume else None
+    if checkpoint:
+        compression = checkpoint['compression']
+        stats = checkpoint['stats']
+        logger.info(f"Resuming export of {path} after {stats['docs']} docs")
+    else:
+        stats = {'docs': 0, 'blobs': 0, 'bytes': 0}
+
+    # Only blobs written in this run are tracked; a resumed export may repeat a
+    # blob, which import handles because blobs are content-addressed.
+    seen_blobs = set()
+    # Time spent before an interruption counts too, so rates cover the whole export
+    started = time.monotonic() - stats.get('seconds', 0)
+
+    with open(path, 'r+b' if checkpoint else 'wb') as f:
+        writer = _MemberWriter(f, compression)
+        if checkpoint:
+            f.truncate(checkpoint['offset'])
+            f.seek(checkpoint['offset'])
+        else:
+            board = board_ref(db, board_id).get()
+            writer.add({
+                'kind': 'header',
+                'format': ARCHIVE_FORMAT,
+                'version': ARCHIVE_VERSION,
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'board': board.to_dict() if board.exists else {'name': board_id, 'members': []},
+            })
+            stats['bytes'] += writer.flush()
+
+        start_index = COLLECTIONS.index(checkpoint['collection']) if checkpoint else 0
+        for collection_name in COLLECTIONS[start_index:]:
+            collection = board_ref(db, board_id).collection(collection_name)
+            cursor = None
+            if checkpoint and checkpoint['collection'] == collection_name and checkpoint['last_id']:
+                cursor = {'__name__': collection.document(checkpoint['last_id'])}
+
+            for page in pages(collection, page_size, start_after=cursor):
+                for doc in page:
+                    data = doc.to_dict()
+                    record = {'kind': 'doc', 'collection': collection_name, 'id': doc.id, 'data': data}
+                    if collection_name == 'tweets' and data.get('media_urls'):
+                        media = {}
+                        for url in data['media_urls'].split(','):
+                            blob = _media_blob(url, media_folder)
+                            if not blob:
+                                continue
+                            digest, content = blob
+                            media[url] = digest
+                            if digest not in seen_blobs:
+                                seen_blobs.add(digest)
+                                writer.add({
+                                    'kind': 'blob',
+                                    'sha256': digest,
+                                    'size': len(content),
+                                    'data': base64.b64encode(content).decode('ascii'),
+                                })
+                                stats['blobs'] += 1
+                                # Flushed members past the last checkpoint are
+                                # truncated away if the export is resumed
+                                if writer.buffered >= MAX_MEMBER_BYTES:
+                                    stats['bytes'] += writer.flush()
+                        if media:
+                            record['media'] = media
+                    writer.add(record)
+                    stats['docs'] += 1
+
+                stats['bytes'] += writer.flush()
+                stats['seconds'] = time.monotonic() - started
+                _save_checkpoint(path, 'export', {
+                    'compression': compression,
+                    'collection': collection_name,
+                    'last_id': page[-1].id,
+                    'offset': f.tell(),
+                    'stats': stats,
+                })
+                logger.info(f"Exported {stats['docs']} docs ({stats['bytes'] / 1e6:.2f} MB)")
+
+        writer.add({'kind': 'end', 'docs': stats['docs'], 'blobs': stats['blobs']})
+        stats['bytes'] += writer.flush()
+
+    _clear_checkpoint(path, 'export')
+    return _report('Export', stats, time.monotonic() - started)
+
+
+def import_board(db, path, media_folder, batch_size=BATCH_SIZE, resume=False,
+                 board_id=DEFAULT_BOARD_ID):
+    """Load an archive into a board with batched writes, restoring local media"""
+    checkpoint = _load_checkpoint(path, 'import') if resume else None
+    skip_docs = checkpoint['docs'] if checkpoint else 0
+    if skip_docs:
+        logger.info(f"Resuming import of {path} after {skip_docs} docs")
+
+    # Blobs are staged under their digest until a tweet names the file they belong to
+    staging_folder = os.path.join(media_folder, '.archive-blobs')
+    os.makedirs(staging_folder, exist_ok=True)
+
+    board = board_ref(db, board_id)
+    stats = {'docs': 0, 'blobs': 0, 'bytes': 0}
+    doc_index = 0
+    batch = db.batch()
+    pending = 0
+    complete = False
+    started = time.monotonic()
+
+    def commit():
+        nonlocal batch, pending
+        if pending:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+        _save_checkpoint(path, 'import', {'docs': doc_index})
+
+    with _open_reader(path) as reader:
+        for line in reader:
+            if not line.strip():
+                continue
+            record = json.loads(line, object_hook=_decode_object)
+            kind = record.get('kind')
+
+            if kind == 'header':
+                if record.get('format') != ARCHIVE_FORMAT or record.get('version', 0) > ARCHIVE_VERSION:
+                    raise ValueError(f"Unsupported archive: {record.get('format')} v{record.get('version')}")
+                # Archives written before boards existed carry no board record
+                if record.get('board') and not board.get().exists:
+                    board.set(record['board'])
+            elif kind == 'blob':
+                blob_path = os.path.join(staging_folder, record['sha256'])
+                if not os.path.exists(blob_path):
+                    content = base64.b64decode(record['data'])
+                    if hashlib.sha256(content).hexdigest() != record['sha256']:
+                        raise ValueError(f"Corrupt blob {record['sha256']}")
+                    with open(blob_path, 'wb') as f:
+                        f.write(content)
+                    stats['blobs'] += 1
+            elif kind == 'doc':
+                doc_index += 1
+                if doc_index <= skip_docs:
+                    continue
+                for url, digest in record.get('media', {}).items():
+                    target = os.path.join(media_folder, os.path.basename(url))
+                    if not os.path.exists(target):
+                        shutil.copyfile(os.path.join(staging_folder, digest), target)
+                batch.set(board.collection(record['collection']).document(record['id']), record['data'])
+                pending += 1
+                stats['docs'] += 1
+                if pending >= batch_size:
+                    commit()
+                    logger.info(f"Imported {doc_index} docs")
+            elif kind == 'end':
+                complete = True
+
+    commit()
+    # Compressed size, as reported by export, so the two rates are comparable
+    stats['bytes'] = os.path.getsize(path)
+    if not complete:
+        logger.warning(f"Archive {path} has no end marker; it may be truncated")
+    _clear_checkpoint(path, 'import')
+    shutil.rmtree(staging_folder, ignore_errors=True)
+    return _report('Import', stats, time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='write the board to an archive')
+    export_parser.add_argument('path')
+    export_parser.add_argument('--compression', choices=('gzip', 'zstd', 'none'), default='gzip')
+    export_parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    export_parser.add_argument('--resume', action='store_true', help='continue an interrupted export')
+    export_parser.add_argument('--board', default=DEFAULT_BOARD_ID, help='id of the board to export')
+
+    import_parser = subparsers.add_parser('import', help='load an archive into Firestore')
+    import_parser.add_argument('path')
+    import_parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    import_parser.add_argument('--resume', action='store_true', help='continue an interrupted import')
+    import_parser.add_argument('--board', default=DEFAULT_BOARD_ID, help='id of the board to import into')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from app import db, MEDIA_FOLDER
+    if db is None:
+        parser.error("Firebase is not configured")
+
+    if args.command == 'export':
+        export_board(db, args.path, MEDIA_FOLDER, compression=args.compression,
+                     page_size=args.page_size, resume=args.resume, board_id=args.board)
+    else:
+        import_board(db, args.path, MEDIA_FOLDER, batch_size=args.batch_size, resume=args.resume,
+                     board_id=args.board)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Firestore layout of boards, shared by the maintenance scripts.
+
+Each board is a document in the top-level `boards` collection with its
+categories and tweets in subcollections. migrate_boards.py, refresher.py
+and board_archive.py take the client as an argument rather than going
+through the app, so they read and write boards with these helpers.
+"""
+
+# Firestore rejects batches with more than 500 writes
+BATCH_SIZE = 400
+# Media downloaded by the app is stored under this URL path
+LOCAL_MEDIA_PREFIX = '/static/media/'
+
+
+def board_ref(db, board_id):
+    return db.collection('boards').document(board_id)
+
+
+def board_collection(db, board_id, name):
+    return board_ref(db, board_id).collection(name)
+
+
+def pages(collection, page_size, start_after=None):
+    """Yield a collection's documents in lists of up to page_size, ordered by id.
+
+    Paging on the document id keeps the cursor stable while the documents
+    of a page are updated. start_after resumes after a document (or cursor)
+    from an earlier run.
+    """
+    cursor = start_after
+    while True:
+        query = collection.order_by('__name__').limit(page_size)
+        if cursor is not None:
+            query = query.start_after(cursor)
+        page = list(query.stream())
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        cursor = page[-1]
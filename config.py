@@ -8,6 +8,61 @@ class Config:
     SQLALCHEMY_DATABASE_URI = "sqlite:///tweets.db"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Seconds to wait before each scrape to avoid overwhelming Twitter's servers
+    SCRAPE_DELAY = float(os.getenv("SCRAPE_DELAY", "2"))
+    
+    # Media downloads: files fetched at once per tweet and across all requests,
+    # and the time limit for each file in seconds
+    MEDIA_CONCURRENCY = int(os.getenv("MEDIA_CONCURRENCY", "4"))
+    MEDIA_GLOBAL_CONCURRENCY = int(os.getenv("MEDIA_GLOBAL_CONCURRENCY", "16"))
+    MEDIA_TIMEOUT = float(os.getenv("MEDIA_TIMEOUT", "15"))
+    
+    # Maximum number of rendered tweet bubbles kept in memory, across all boards
+    TWEET_FRAGMENT_CACHE_SIZE = int(os.getenv("TWEET_FRAGMENT_CACHE_SIZE", "5000"))
+    
+    # Seconds a user's board memberships are cached per process
+    BOARD_CACHE_TTL = float(os.getenv("BOARD_CACHE_TTL", "60"))
+    
+    # JSON API: seconds category versions are cached per process, and the
+    # smallest response body worth compressing
+    API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", "5"))
+    API_COMPRESS_MIN_SIZE = int(os.getenv("API_COMPRESS_MIN_SIZE", "512"))
+    
+    # Admission control for tweet submissions: a token bucket per user, at
+    # most INGEST_MAX_IN_FLIGHT scrapes at once and up to INGEST_MAX_QUEUED
+    # requests waiting INGEST_QUEUE_TIMEOUT seconds for a slot. RATE_LIMIT_BACKEND
+    # is "memory" (per process) or a redis:// URL shared by all processes; a
+    # slot held longer than INGEST_LEASE_TIMEOUT seconds is freed for others
+    ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1").lower() in ("1", "true", "yes")
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "10"))
+    RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "5"))
+    INGEST_MAX_IN_FLIGHT = int(os.getenv("INGEST_MAX_IN_FLIGHT", "4"))
+    INGEST_MAX_QUEUED = int(os.getenv("INGEST_MAX_QUEUED", "8"))
+    INGEST_QUEUE_TIMEOUT = float(os.getenv("INGEST_QUEUE_TIMEOUT", "5"))
+    INGEST_LEASE_TIMEOUT = float(os.getenv("INGEST_LEASE_TIMEOUT", "120"))
+    
+    # Background refresher (refresher.py): worker threads, scrapes per second,
+    # tweets considered per pass and seconds between media checks of a tweet
+    REFRESH_WORKERS = int(os.getenv("REFRESH_WORKERS", "4"))
+    REFRESH_SCRAPE_RATE = float(os.getenv("REFRESH_SCRAPE_RATE", "0.5"))
+    REFRESH_BATCH_LIMIT = int(os.getenv("REFRESH_BATCH_LIMIT", "200"))
+    REFRESH_MEDIA_MAX_AGE = float(os.getenv("REFRESH_MEDIA_MAX_AGE", str(7 * 24 * 3600)))
+    REFRESH_MAX_ATTEMPTS = int(os.getenv("REFRESH_MAX_ATTEMPTS", "5"))
+    REFRESH_RETRY_BACKOFF = float(os.getenv("REFRESH_RETRY_BACKOFF", "3600"))
+    
+    # Firestore availability: seconds allowed for each call, consecutive
+    # failures that open the circuit breaker, seconds before it lets a probe
+    # through, where board snapshots and queued writes are kept on local disk
+    # while it is open (default: <instance folder>/degraded), and seconds
+    # between rewrites of a board's snapshot when no write has changed it
+    FIRESTORE_TIMEOUT = float(os.getenv("FIRESTORE_TIMEOUT", "5"))
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+    BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+    DEGRADED_FOLDER = os.getenv("DEGRADED_FOLDER")
+    SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "60"))
+    
+    
     # Firebase configuration
     FIREBASE_PROJECT_ID = os.getenv('FIREBASE_PROJECT_ID', 'tweetdeez-33d7b')
     FIREBASE_PRIVATE_KEY_ID = os.getenv('FIREBASE_PRIVATE_KEY_ID')
@@ -0,0 +1,81 @@
+"""Move the single global board into boards/default.
+
+Before boards existed, categories and tweets lived in top-level
+collections. This copies them, keeping their ids, into the subcollections
+of boards/<board_id> with batched writes, and creates the board with every
+configured Basic-auth user as a member. Running it again is safe: documents
+are overwritten with the same data and members are merged. The top-level
+collections are only removed when --delete-source is given.
+
+Usage:
+    python migrate_boards.py
+    python migrate_boards.py --delete-source
+"""
+import argparse
+import logging
+
+from firebase_admin import firestore
+
+from board_store import BATCH_SIZE, board_ref, pages
+
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ('categories', 'tweets')
+# Every page is copied in one batch
+DEFAULT_PAGE_SIZE = BATCH_SIZE
+
+
+def migrate(db, members, board_id='default', name='Default', delete_source=False,
+            page_size=DEFAULT_PAGE_SIZE):
+    """Copy the top-level collections into a board and return the number of documents moved"""
+    board = board_ref(db, board_id)
+    board.set({'name': name, 'members': firestore.ArrayUnion(list(members))}, merge=True)
+
+    moved = 0
+    for collection_name in COLLECTIONS:
+        target = board.collection(collection_name)
+        for page in pages(db.collection(collection_name), page_size):
+            batch = db.batch()
+            for doc in page:
+                batch.set(target.document(doc.id), doc.to_dict())
+            batch.commit()
+            moved += len(page)
+            logger.info(f"Copied {moved} docs")
+
+    if delete_source:
+        # Deleting while paging would shift the cursor, so always read the first page
+        for collection_name in COLLECTIONS:
+            while True:
+                page = list(db.collection(collection_name).limit(page_size).stream())
+                if not page:
+                    break
+                batch = db.batch()
+                for doc in page:
+                    batch.delete(doc.reference)
+                batch.commit()
+        logger.info("Deleted the top-level collections")
+
+    logger.info(f"Moved {moved} docs into board {board_id}")
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--board', default='default', help='id of the board to move the data into')
+    parser.add_argument('--name', default='Default', help='display name of the board')
+    parser.add_argument('--delete-source', action='store_true',
+                        help='remove the top-level collections once copied')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from app import configured_usernames, db
+    if db is None:
+        parser.error("Firebase is not configured")
+
+    migrate(db, configured_usernames(), board_id=args.board, name=args.name,
+            delete_source=args.delete_source, page_size=args.page_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""Admission control for the ingest routes.
+
+Each user gets a token bucket, and a bounded number of scrapes may be in
+flight at once with a bounded queue of waiters behind them. Buckets and
+in-flight slots are kept in process by default or in Redis when several
+processes must share limits. Slots are leases that expire, so a process
+that dies mid-scrape cannot hold one forever. Requests that cannot be
+admitted are rejected straight away so they never tie up a worker.
+"""
+import math
+import threading
+import time
+import uuid
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class InMemoryBackend:
+    """Token buckets and slots held in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._leases = {}
+
+    def take(self, key, rate, capacity, cost=1):
+        """Take tokens from a bucket; returns 0 if allowed, else seconds until it would be.
+        
+        A negative cost gives tokens back.
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (min(capacity, tokens - cost), now)
+                return 0
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / rate
+
+    def acquire(self, key, limit, lease_timeout):
+        """Lease one of `limit` slots for lease_timeout seconds; returns a lease id or None"""
+        with self._lock:
+            now = time.monotonic()
+            leases = {lease: expires for lease, expires in self._leases.get(key, {}).items()
+                      if expires > now}
+            self._leases[key] = leases
+            if len(leases) >= limit:
+                return None
+            lease = uuid.uuid4().hex
+            leases[lease] = now + lease_timeout
+            return lease
+
+    def release(self, key, lease):
+        with self._lock:
+            self._leases.get(key, {}).pop(lease, None)
+
+
+class RedisBackend:
+    """Token buckets and slots shared between processes through Redis"""
+
+    # Refill and take atomically, using the Redis clock so app servers need not agree on time
+    SCRIPT = """
+    local now_parts = redis.call('TIME')
+    local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+    local rate = tonumber(ARGV[1])
+    local capacity = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated) * rate)
+    local wait = 0
+    if tokens >= cost then
+        tokens = math.min(capacity, tokens - cost)
+    else
+        wait = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return tostring(wait)
+    """
+
+    # Slots are a sorted set of lease ids scored by expiry; expired leases are dropped first
+    ACQUIRE_SCRIPT = """
+    local now_parts = redis.call('TIME')
+    local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+    local limit = tonumber(ARGV[1])
+    local lease_timeout = tonumber(ARGV[2])
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+    if redis.call('ZCARD', KEYS[1]) >= limit then
+        return 0
+    end
+    redis.call('ZADD', KEYS[1], now + lease_timeout, ARGV[3])
+    redis.call('EXPIRE', KEYS[1], math.ceil(lease_timeout) + 1)
+    return 1
+    """
+
+    def __init__(self, url, prefix='ratelimit:'):
+        if redis is None:
+            raise RuntimeError("The redis rate limit backend requires the redis package")
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+        self._acquire_script = self._client.register_script(self.ACQUIRE_SCRIPT)
+        self._prefix = prefix
+
+    def take(self, key, rate, capacity, cost=1):
+        return float(self._script(keys=[self._prefix + key], args=[rate, capacity, cost]))
+
+    def acquire(self, key, limit, lease_timeout):
+        lease = uuid.uuid4().hex
+        if self._acquire_script(keys=[self._prefix + key], args=[limit, lease_timeout, lease]):
+            return lease
+        return None
+
+    def release(self, key, lease):
+        self._client.zrem(self._prefix + key, lease)
+
+
+def create_backend(url):
+    """Backend for a RATE_LIMIT_BACKEND setting: 'memory' or a redis:// URL"""
+    if not url or url == 'memory':
+        return InMemoryBackend()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(url)
+    raise ValueError(f"Unknown rate limit backend: {url}")
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionControl:
+    """Per-user token buckets plus a global cap on in-flight work, both kept in the backend"""
+
+    # Waiters poll the backend for a slot, backing off up to this many seconds between tries
+    MAX_POLL_INTERVAL = 0.25
+
+    def __init__(self, backend, per_minute, burst, max_in_flight, max_queued, queue_timeout,
+                 lease_timeout=120):
+        self.backend = backend
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.lease_timeout = lease_timeout
+
+    def admit(self, user):
+        """Reserve a slot for user and return its lease for release().
+        
+        Raises Rejected when the user is over their limit or the queue is full;
+        a user turned away for lack of a slot gets their token back.
+        """
+        wait = self.backend.take(f"user:{user}", self.rate, self.burst)
+        if wait > 0:
+            raise Rejected("Too many submissions, slow down", wait)
+        try:
+            return self._acquire_slot()
+        except Rejected:
+            self.backend.take(f"user:{user}", self.rate, self.burst, cost=-1)
+            raise
+
+    def _acquire_slot(self):
+        lease = self.backend.acquire("in_flight", self.max_in_flight, self.lease_timeout)
+        if lease:
+            return lease
+        queued = self.backend.acquire("queued", self.max_queued, self.queue_timeout + self.MAX_POLL_INTERVAL)
+        if not queued:
+            raise Rejected("Server busy, try again shortly", self.queue_timeout)
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            interval = 0.01
+            while time.monotonic() < deadline:
+                time.sleep(min(interval, max(0, deadline - time.monotonic())))
+                lease = self.backend.acquire("in_flight", self.max_in_flight, self.lease_timeout)
+                if lease:
+                    return lease
+                interval = min(interval * 2, self.MAX_POLL_INTERVAL)
+            raise Rejected("Server busy, try again shortly", self.queue_timeout)
+        finally:
+            self.backend.release("queued", queued)
+
+    def release(self, lease):
+        self.backend.release("in_flight", lease)
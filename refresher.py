@@ -0,0 +1,333 @@
+"""Background refresh of stale tweet metadata and dead media.
+
+Finds tweets on every board whose scrape fell back to placeholders (text not found,
+unknown author or timestamp) and tweets whose media has not been checked
+recently, re-scrapes them through a rate-limited worker pool and writes the
+fixes back in batches. It runs as its own process, so it never competes
+with web requests for a worker.
+
+A tweet that is still degraded after a refresh is retried with exponential
+backoff and given up on after a number of attempts, so tweets that can
+never be repaired do not crowd out the others. Web processes pick up the
+fixes on their own: rendered tweets are cached by content and category
+versions are bumped in the same batches.
+
+Usage:
+    python refresher.py                  # one pass
+    python refresher.py --interval 3600  # keep running, one pass per hour
+    python refresher.py backfill         # index fields for tweets added before the refresher
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from firebase_admin import firestore
+from google.api_core.exceptions import GoogleAPIError
+
+from app import app, download_all_media, is_degraded, scrape_tweet, TWEET_TEXT_NOT_FOUND, UNKNOWN
+from board_store import BATCH_SIZE, LOCAL_MEDIA_PREFIX, board_collection, pages
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Spaces out calls across threads to at most `rate` per second"""
+
+    def __init__(self, rate):
+        self._interval = 1.0 / rate if rate > 0 else 0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def find_degraded(db, board_id, limit):
+    """Degraded tweets whose next refresh is due, longest due first.
+    
+    Tweets that have been given up on have no 'refresh_after' and are left
+    out of the ordering. Tweets stored before these fields existed need a
+    backfill first.
+    """
+    now = time.time()
+    due = []
+    query = (board_collection(db, board_id, 'tweets').where('degraded', '==', True)
+             .order_by('refresh_after').limit(limit))
+    for doc in query.stream():
+        if doc.to_dict().get('refresh_after', 0) > now:
+            break
+        due.append(doc)
+    return due
+
+
+def find_media_due(db, board_id, limit, max_age):
+    """Tweets whose media was checked longest ago, oldest first"""
+    cutoff = time.time() - max_age
+    due = []
+    for doc in board_collection(db, board_id, 'tweets').order_by('media_checked_at').limit(limit).stream():
+        if doc.to_dict().get('media_checked_at', 0) > cutoff:
+            break
+        due.append(doc)
+    return due
+
+
+def media_alive(url, media_folder, timeout):
+    if url.startswith(LOCAL_MEDIA_PREFIX):
+        return os.path.exists(os.path.join(media_folder, os.path.basename(url)))
+    try:
+        response = requests.head(url, timeout=timeout, allow_redirects=True)
+        return response.status_code < 400
+    except requests.exceptions.RequestException:
+        return False
+
+
+class Refresher:
+    def __init__(self, db, media_folder, workers=4, scrape_rate=0.5, batch_limit=200,
+                 media_max_age=7 * 24 * 3600, max_attempts=5, retry_backoff=3600, timeout=10):
+        self.db = db
+        self.media_folder = media_folder
+        self.workers = workers
+        self.limiter = RateLimiter(scrape_rate)
+        self.batch_limit = batch_limit
+        self.media_max_age = media_max_age
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+
+    def _scrape(self, url):
+        self.limiter.wait()
+        return scrape_tweet(url)
+
+    def refresh_tweet(self, doc, check_media):
+        """Work out the fix for one tweet; returns (update, status).
+        
+        status is 'ok' when nothing was wrong, otherwise 'repaired' or 'broken'.
+        """
+        data = doc.to_dict()
+        update = {}
+        degraded = data.get('degraded') or is_degraded({
+            'text': data.get('tweet_text'),
+            'author': data.get('author'),
+            'timestamp': data.get('timestamp'),
+        })
+        media_urls = [url for url in (data.get('media_urls') or '').split(',') if url]
+        dead_media = []
+        if check_media:
+            dead_media = [url for url in media_urls
+                          if not media_alive(url, self.media_folder, self.timeout)]
+            update['media_checked_at'] = time.time()
+
+        if not degraded and not dead_media:
+            return update, 'ok'
+
+        if degraded:
+            # Recorded whatever the outcome; a repaired tweet drops out of find_degraded anyway
+            attempts = data.get('refresh_attempts', 0) + 1
+            update['refresh_attempts'] = attempts
+            update['refresh_attempted_at'] = time.time()
+            if attempts >= self.max_attempts:
+                update['refresh_after'] = firestore.DELETE_FIELD
+            else:
+                update['refresh_after'] = time.time() + self.retry_backoff * 2 ** (attempts - 1)
+
+        tweet_data = self._scrape(data.get('original_url')) if data.get('original_url') else None
+        if not tweet_data:
+            return update, 'broken'
+
+        if degraded:
+            # Only replace placeholders, never overwrite good data with a worse scrape
+            merged = {
+                'text': data.get('tweet_text'),
+                'author': data.get('author'),
+                'username': data.get('username'),
+                'timestamp': data.get('timestamp'),
+            }
+            if merged['text'] in (None, TWEET_TEXT_NOT_FOUND):
+                merged['text'] = tweet_data['text']
+            if merged['author'] in (None, UNKNOWN):
+                merged['author'] = tweet_data['author']
+                merged['username'] = tweet_data['username']
+            if merged['timestamp'] in (None, UNKNOWN, ''):
+                merged['timestamp'] = tweet_data['timestamp']
+            update.update({
+                'tweet_text': merged['text'],
+                'author': merged['author'],
+                'username': merged['username'],
+                'timestamp': merged['timestamp'],
+                'degraded': is_degraded(merged),
+            })
+            degraded = update['degraded']
+
+        if dead_media or (not media_urls and tweet_data.get('media')):
+            fresh_media = download_all_media(tweet_data.get('media', []))
+            alive = [url for url in fresh_media
+                     if media_alive(url, self.media_folder, self.timeout)]
+            if alive:
+                update['media_urls'] = ','.join(alive)
+                dead_media = []
+
+        return update, 'broken' if degraded or dead_media else 'repaired'
+
+    def run_once(self):
+        """Refresh one round of candidates on every board and return counts of the outcome"""
+        started = time.monotonic()
+        stats = {'checked': 0, 'repaired': 0, 'still_broken': 0, 'errors': 0}
+        for board in self.db.collection('boards').stream():
+            for key, value in self.refresh_board(board.id).items():
+                stats[key] += value
+
+        stats['seconds'] = round(time.monotonic() - started, 1)
+        logger.info(f"Refresh: checked {stats['checked']}, repaired {stats['repaired']}, "
+                    f"still broken {stats['still_broken']}, errors {stats['errors']} "
+                    f"in {stats['seconds']}s")
+        return stats
+
+    def refresh_board(self, board_id):
+        """Refresh one round of candidates on a single board"""
+        candidates = {doc.id: (doc, False) for doc in find_degraded(self.db, board_id, self.batch_limit)}
+        for doc in find_media_due(self.db, board_id, self.batch_limit, self.media_max_age):
+            candidates[doc.id] = (doc, True)
+
+        stats = {'checked': len(candidates), 'repaired': 0, 'still_broken': 0, 'errors': 0}
+        if not candidates:
+            logger.info(f"Refresh of board {board_id}: nothing to do")
+            return stats
+
+        def work(item):
+            doc, check_media = item
+            try:
+                return (doc, *self.refresh_tweet(doc, check_media))
+            except Exception as e:
+                logger.error(f"Error refreshing tweet {doc.id}: {str(e)}")
+                return doc, None, 'error'
+
+        batch = self.db.batch()
+        pending = 0
+
+        def commit():
+            # A tweet or category deleted since it was read fails the whole batch;
+            # count its writes as errors and carry on with the rest of the pass
+            try:
+                batch.commit()
+            except GoogleAPIError as e:
+                logger.error(f"Error writing {pending} refresh updates on board {board_id}: {str(e)}")
+                stats['errors'] += pending
+
+        changed_categories = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="refresh") as executor:
+            for doc, update, status in executor.map(work, candidates.values()):
+                if status == 'error':
+                    stats['errors'] += 1
+                    continue
+                if status == 'repaired':
+                    stats['repaired'] += 1
+                elif status == 'broken':
+                    stats['still_broken'] += 1
+                if set(update) - {'media_checked_at', 'refresh_attempts', 'refresh_attempted_at',
+                                  'refresh_after'}:
+                    changed_categories.add(doc.to_dict().get('category'))
+                if update:
+                    batch.update(doc.reference, update)
+                    pending += 1
+                if pending >= BATCH_SIZE:
+                    commit()
+                    batch = self.db.batch()
+                    pending = 0
+
+        for category_id in filter(None, changed_categories):
+            batch.update(board_collection(self.db, board_id, 'categories').document(str(category_id)),
+                         {'version': firestore.Increment(1)})
+            pending += 1
+            if pending >= BATCH_SIZE:
+                commit()
+                batch = self.db.batch()
+                pending = 0
+        if pending:
+            commit()
+        return stats
+
+
+def backfill(db, page_size=BATCH_SIZE):
+    """Add the refresher's indexed fields to tweets stored before they existed"""
+    updated = 0
+    for board in db.collection('boards').stream():
+        updated += backfill_board(db, board.id, page_size)
+    logger.info(f"Backfilled {updated} tweets")
+    return updated
+
+
+def backfill_board(db, board_id, page_size=BATCH_SIZE):
+    updated = 0
+    for page in pages(board_collection(db, board_id, 'tweets'), page_size):
+        batch = db.batch()
+        pending = 0
+        for doc in page:
+            data = doc.to_dict()
+            if 'degraded' in data and 'media_checked_at' in data and (
+                    'refresh_after' in data or 'refresh_attempts' in data):
+                continue
+            batch.update(doc.reference, {
+                'degraded': is_degraded({
+                    'text': data.get('tweet_text'),
+                    'author': data.get('author'),
+                    'timestamp': data.get('timestamp'),
+                }),
+                # Zero sorts first, so these tweets get their media checked soonest
+                'media_checked_at': data.get('media_checked_at', 0),
+                'refresh_after': 0,
+            })
+            pending += 1
+        if pending:
+            batch.commit()
+            updated += pending
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', nargs='?', choices=('run', 'backfill'), default='run')
+    parser.add_argument('--interval', type=float, default=0,
+                        help='seconds between passes; 0 runs a single pass')
+    parser.add_argument('--workers', type=int, default=app.config["REFRESH_WORKERS"])
+    parser.add_argument('--rate', type=float, default=app.config["REFRESH_SCRAPE_RATE"],
+                        help='maximum scrapes per second')
+    parser.add_argument('--limit', type=int, default=app.config["REFRESH_BATCH_LIMIT"],
+                        help='tweets considered per pass')
+    parser.add_argument('--media-max-age', type=float, default=app.config["REFRESH_MEDIA_MAX_AGE"],
+                        help='seconds before a tweet\'s media is checked again')
+    parser.add_argument('--max-attempts', type=int, default=app.config["REFRESH_MAX_ATTEMPTS"],
+                        help='refreshes of a degraded tweet before giving up on it')
+    parser.add_argument('--retry-backoff', type=float, default=app.config["REFRESH_RETRY_BACKOFF"],
+                        help='seconds before a degraded tweet is retried, doubling each attempt')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from app import db, MEDIA_FOLDER
+    if db is None:
+        parser.error("Firebase is not configured")
+
+    if args.command == 'backfill':
+        backfill(db)
+        return
+
+    refresher = Refresher(db, MEDIA_FOLDER, workers=args.workers, scrape_rate=args.rate,
+                          batch_limit=args.limit, media_max_age=args.media_max_age,
+                          max_attempts=args.max_attempts, retry_backoff=args.retry_backoff)
+    while True:
+        refresher.run_once()
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
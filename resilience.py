@@ -0,0 +1,231 @@
+"""Keeping the board usable while Firestore is down or slow.
+
+A circuit breaker stops calling Firestore after repeated failures and lets
+a single probe through once the reset timeout has passed. While it is open
+the app serves the last board it loaded successfully from an on-disk
+snapshot, and writes are appended to an on-disk queue that is replayed in
+order once Firestore answers again. Both live on local disk so they survive
+a restart, and the queue is file-locked so several worker processes on one
+host can share it.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from werkzeug.utils import secure_filename
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures for `reset_timeout` seconds"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return self.CLOSED
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self.OPEN
+
+    def allow(self):
+        """Whether a call may go ahead; only one probe is let through while half open"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self):
+        """End a probe without a verdict, when it failed for reasons other than the service"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def retry_after(self):
+        """Seconds until the next probe is allowed"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+
+class SnapshotStore:
+    """JSON documents kept on disk, each replaced atomically.
+
+    A snapshot is rewritten at most every `interval` seconds, or sooner once
+    expire() says the data behind it has changed, so busy read paths do not
+    serialize the same data on every request.
+    """
+
+    def __init__(self, folder, interval=0):
+        self.folder = folder
+        self.interval = interval
+        self._digests = {}
+        self._saved_at = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.folder, secure_filename(name) + '.json')
+
+    def due(self, name):
+        """Whether save() would consider writing this snapshot now"""
+        with self._lock:
+            saved_at = self._saved_at.get(name)
+        return saved_at is None or time.monotonic() - saved_at >= self.interval
+
+    def expire(self, name):
+        """Let the next save() of a snapshot through, e.g. after a write changed its data"""
+        with self._lock:
+            self._saved_at.pop(name, None)
+
+    def save(self, name, data):
+        """Write a snapshot if it is due and changed since the last save in this process.
+        
+        A snapshot that cannot be written, e.g. on a read-only filesystem, is
+        skipped with a warning rather than failing the request that made it.
+        """
+        if not self.due(name):
+            return False
+        with self._lock:
+            self._saved_at[name] = time.monotonic()
+        body = json.dumps(data, default=str, separators=(',', ':'), sort_keys=True)
+        digest = hash(body)
+        with self._lock:
+            if self._digests.get(name) == digest:
+                return False
+            self._digests[name] = digest
+        path = self._path(name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                f.write(json.dumps({'saved_at': time.time(), 'data': json.loads(body)}))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not save snapshot {name}: {str(e)}")
+            with self._lock:
+                self._digests.pop(name, None)
+                self._saved_at.pop(name, None)
+            return False
+        return True
+
+    def load(self, name):
+        """(saved_at, data) for a snapshot, or None if there is none"""
+        try:
+            with open(self._path(name)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return snapshot['saved_at'], snapshot['data']
+
+
+class WriteQueue:
+    """Append-only NDJSON queue of writes, replayed oldest first.
+
+    Replay moves the queue aside to `<path>.replaying` and rewrites that file
+    after every entry, so a replay interrupted by a crash or another outage
+    resumes where it stopped, ahead of anything queued since.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._replaying_path = path + '.replaying'
+        self._lock_path = path + '.lock'
+        self._replay_lock_path = path + '.replay-lock'
+
+    @contextmanager
+    def _locked(self, lock_path, blocking=True):
+        os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+        with open(lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def append(self, entry):
+        with self._locked(self._lock_path):
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def pending(self):
+        """Whether any writes are waiting to be replayed"""
+        return os.path.exists(self.path) or os.path.exists(self._replaying_path)
+
+    def __len__(self):
+        return len(self._read(self._replaying_path)) + len(self._read(self.path))
+
+    def replay(self, apply):
+        """Pass queued entries to apply() in order and return how many were applied.
+
+        apply() returns False to stop and keep the entry for a later replay.
+        Returns straight away if another thread or process is already replaying.
+        """
+        applied = 0
+        with self._locked(self._replay_lock_path, blocking=False) as acquired:
+            if not acquired:
+                return applied
+            while True:
+                if not os.path.exists(self._replaying_path):
+                    with self._locked(self._lock_path):
+                        if not os.path.exists(self.path):
+                            return applied
+                        os.replace(self.path, self._replaying_path)
+
+                entries = self._read(self._replaying_path)
+                while entries:
+                    if not apply(entries[0]):
+                        return applied
+                    entries.pop(0)
+                    applied += 1
+                    tmp_path = self._replaying_path + '.tmp'
+                    with open(tmp_path, 'w') as f:
+                        f.writelines(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries)
+                    os.replace(tmp_path, self._replaying_path)
+                os.remove(self._replaying_path)
@@ -0,0 +1,53 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_firestore import FakeFirestore, Faults  # noqa: E402
+from benchmarks.run import (BENCH_BOARD_ID, auth_headers, bench_board_collection,  # noqa: E402
+                            configure_bench_app, load_app)
+from resilience import CircuitBreaker, SnapshotStore, WriteQueue  # noqa: E402
+
+RESET_TIMEOUT = 0.2
+
+
+@pytest.fixture
+def faults():
+    return Faults()
+
+
+@pytest.fixture
+def app_module(monkeypatch, tmp_path, faults):
+    """The app against a FakeFirestore with injectable faults and its own degraded-mode state"""
+    module = load_app()
+    monkeypatch.setattr(module, 'db', None)
+    monkeypatch.setattr(module, 'board_snapshots', SnapshotStore(str(tmp_path / 'snapshots'), 60))
+    monkeypatch.setattr(module, 'write_queue', WriteQueue(str(tmp_path / 'write-queue.ndjson')))
+    monkeypatch.setattr(module, 'firestore_breaker', CircuitBreaker(2, RESET_TIMEOUT))
+    monkeypatch.setitem(module.FIRESTORE_DEADLINE, 'timeout', 0.05)
+    configure_bench_app(module, db=FakeFirestore(faults=faults))
+    module.invalidate_category_cache(BENCH_BOARD_ID)
+    categories = bench_board_collection(module.db, 'categories')
+    categories.document('category-0').set({'name': 'Existing', 'position': 0})
+    bench_board_collection(module.db, 'tweets').document('tweet-0').set({
+        'tweet_text': 'Snapshot tweet', 'author': 'Author', 'username': 'author',
+        'timestamp': '2024-01-01T00:00:00.000Z', 'media_urls': None,
+        'category': 'category-0', 'original_url': 'https://x.com/author/status/1',
+    })
+    yield module
+    # Let a background replay finish before the next test swaps the queue out
+    thread = module._replay_thread
+    if thread is not None:
+        thread.join(timeout=5)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def headers():
+    return auth_headers()
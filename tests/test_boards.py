@@ -0,0 +1,45 @@
+"""Which board a request reads and writes"""
+from benchmarks.run import bench_board_collection
+
+
+def test_board_picked_with_query_parameter_receives_later_writes(app_module, client, headers):
+    app_module.db.collection('boards').document('other').set({'name': 'Other', 'members': ['bench']})
+    app_module.invalidate_membership_cache()
+
+    assert client.get('/?board=other', headers=headers).status_code == 200
+    client.post('/add_category', headers=headers, data={'name': 'Written from other'})
+
+    other = app_module.db.collection('boards').document('other').collection('categories')
+    assert [doc.to_dict()['name'] for doc in other.stream()] == ['Written from other']
+    names = [doc.to_dict()['name'] for doc in bench_board_collection(app_module.db, 'categories').stream()]
+    assert names == ['Existing']
+
+
+def test_query_parameter_for_a_board_the_user_is_not_on_is_ignored(app_module, client, headers):
+    app_module.db.collection('boards').document('private').set({'name': 'Private', 'members': ['someone']})
+    app_module.invalidate_membership_cache()
+
+    client.get('/?board=private', headers=headers)
+    client.post('/add_category', headers=headers, data={'name': 'Stays home'})
+
+    private = app_module.db.collection('boards').document('private').collection('categories')
+    assert list(private.stream()) == []
+    names = [doc.to_dict()['name'] for doc in bench_board_collection(app_module.db, 'categories').stream()]
+    assert sorted(names) == ['Existing', 'Stays home']
+
+
+def test_fragment_cache_size_caps_all_boards_together(app_module, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'TWEET_FRAGMENT_CACHE_SIZE', 10)
+    monkeypatch.setattr(app_module, 'tweet_fragment_caches', {})
+    tweet = {'tweet_text': 'Text', 'author': 'Author', 'username': 'author',
+             'timestamp': '2024-01-01T00:00:00.000Z', 'media_urls': None}
+    with app_module.app.test_request_context():
+        for number in range(3):
+            app_module.render_tweet(dict(tweet, id=f'small-{number}'), board_id='small')
+        for number in range(20):
+            app_module.render_tweet(dict(tweet, id=f'large-{number}'), board_id='large')
+
+    caches = app_module.tweet_fragment_caches
+    assert sum(len(cache) for cache in caches.values()) == 10
+    assert list(caches['small']) == ['small-0', 'small-1', 'small-2']
+    assert list(caches['large']) == [f'large-{number}' for number in range(13, 20)]
@@ -0,0 +1,205 @@
+"""Circuit breaker, board snapshots and the write queue with Firestore failing"""
+import time
+
+import pytest
+
+from conftest import RESET_TIMEOUT
+from benchmarks.run import bench_board_collection
+from resilience import CircuitBreaker, WriteQueue
+
+
+def wait_for_replay(app_module, timeout=5):
+    deadline = time.monotonic() + timeout
+    while app_module.write_queue.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not app_module.write_queue.pending()
+
+
+def test_breaker_opens_after_threshold_and_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=RESET_TIMEOUT)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(RESET_TIMEOUT)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # A failed probe opens the circuit again for a full reset timeout
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    time.sleep(RESET_TIMEOUT)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_slow_firestore_opens_breaker_and_board_is_served_from_snapshot(app_module, client, headers, faults):
+    assert client.get('/', headers=headers).status_code == 200
+
+    faults.latency = 1
+    for _ in range(2):
+        response = client.get('/', headers=headers)
+        assert response.status_code == 200
+        assert b'read-only copy' in response.data
+    assert app_module.firestore_breaker.state == CircuitBreaker.OPEN
+
+    calls = faults.calls
+    response = client.get('/', headers=headers)
+    assert b'Snapshot tweet' in response.data
+    assert faults.calls == calls, "an open breaker must not call Firestore"
+
+    response = client.get('/api/v1/board?include=tweets', headers=headers)
+    assert response.status_code == 200
+    assert 'snapshot_saved_at' in response.get_json()
+
+    faults.latency = 0
+    time.sleep(RESET_TIMEOUT)
+    response = client.get('/', headers=headers)
+    assert b'read-only copy' not in response.data
+    assert app_module.firestore_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_board_without_snapshot_answers_503(app_module, client, headers, faults):
+    # Membership is cached, so only the board read fails
+    app_module.user_boards('bench')
+    faults.down = True
+    response = client.get('/', headers=headers)
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+
+
+def test_writes_during_outage_are_queued_in_order_and_replayed(app_module, client, headers, faults):
+    client.get('/', headers=headers)
+    faults.down = True
+    names = [f'Queued {number}' for number in range(5)]
+    for name in names:
+        assert client.post('/add_category', headers=headers, data={'name': name}).status_code == 302
+    client.post('/delete_tweet/tweet-0', headers=headers)
+
+    # A replay may already have moved the oldest entries aside, and failed
+    queue = app_module.write_queue
+    entries = queue._read(queue._replaying_path) + queue._read(queue.path)
+    assert [entry['operation'] for entry in entries] == ['create_category'] * 5 + ['remove_tweet']
+    assert [entry['params']['name'] for entry in entries[:5]] == names
+
+    faults.down = False
+    time.sleep(RESET_TIMEOUT)
+    client.get('/', headers=headers)
+    wait_for_replay(app_module)
+
+    categories = sorted((doc.to_dict() for doc in bench_board_collection(app_module.db, 'categories').stream()),
+                        key=lambda category: category['position'])
+    assert [category['name'] for category in categories] == ['Existing'] + names
+    assert not bench_board_collection(app_module.db, 'tweets').document('tweet-0').get().exists
+
+
+def test_writes_queue_behind_pending_writes(app_module, client, headers, faults):
+    client.get('/', headers=headers)
+    faults.down = True
+    for name in ('First', 'Second'):
+        client.post('/add_category', headers=headers, data={'name': name})
+    assert app_module.firestore_breaker.state == CircuitBreaker.OPEN
+    # Firestore is back, but older writes have not been replayed yet
+    faults.down = False
+    client.post('/add_category', headers=headers, data={'name': 'Third'})
+    assert len(app_module.write_queue) == 3
+    names = [doc.to_dict()['name'] for doc in bench_board_collection(app_module.db, 'categories').stream()]
+    assert names == ['Existing']
+
+
+def test_replay_resumes_after_a_crash_ahead_of_newer_writes(tmp_path):
+    queue = WriteQueue(str(tmp_path / 'queue.ndjson'))
+    for number in range(4):
+        queue.append({'number': number})
+
+    applied = []
+
+    def crash_after_two(entry):
+        if len(applied) == 2:
+            raise KeyboardInterrupt
+        applied.append(entry['number'])
+        return True
+
+    with pytest.raises(KeyboardInterrupt):
+        queue.replay(crash_after_two)
+    assert applied == [0, 1]
+    assert (tmp_path / 'queue.ndjson.replaying').exists()
+
+    # Written after the crash, so it must wait for the interrupted replay
+    queue.append({'number': 4})
+    restarted = WriteQueue(str(tmp_path / 'queue.ndjson'))
+    assert len(restarted) == 3
+    assert restarted.replay(lambda entry: applied.append(entry['number']) or True) == 3
+    assert applied == [0, 1, 2, 3, 4]
+    assert not restarted.pending()
+
+
+def test_replay_stops_at_a_failed_entry_and_keeps_it(tmp_path):
+    queue = WriteQueue(str(tmp_path / 'queue.ndjson'))
+    for number in range(3):
+        queue.append({'number': number})
+    assert queue.replay(lambda entry: entry['number'] < 1) == 1
+    assert len(queue) == 2
+    applied = []
+    assert queue.replay(lambda entry: applied.append(entry['number']) or True) == 2
+    assert applied == [1, 2]
+
+
+def test_firebase_missing_at_import_is_retried_through_the_breaker(app_module, client, headers, monkeypatch):
+    fake_db = app_module.db
+    monkeypatch.setattr(app_module, 'db', None)
+    attempts = []
+
+    def initialize_firebase():
+        attempts.append(time.monotonic())
+        if len(attempts) <= 2:
+            raise ValueError("FIREBASE_PROJECT_ID environment variable is not set")
+        return fake_db
+
+    monkeypatch.setattr(app_module, 'initialize_firebase', initialize_firebase)
+    app_module.invalidate_membership_cache()
+
+    for _ in range(2):
+        assert client.get('/', headers=headers).status_code == 503
+    assert app_module.firestore_breaker.state == CircuitBreaker.OPEN
+    assert client.get('/', headers=headers).status_code == 503
+    assert len(attempts) == 2, "an open breaker must not retry initialization"
+
+    time.sleep(RESET_TIMEOUT)
+    response = client.get('/', headers=headers)
+    assert response.status_code == 200
+    assert app_module.db is fake_db
+    assert b'Snapshot tweet' in response.data
+
+
+def test_tweet_added_during_outage_is_stored_without_scraping_again(app_module, client, headers, faults,
+                                                                     monkeypatch):
+    scraped = []
+
+    def scrape_tweet(url):
+        scraped.append(url)
+        return {'text': 'Queued tweet', 'author': 'Author', 'username': 'author',
+                'timestamp': '2024-01-01T00:00:00.000Z', 'media': []}
+
+    monkeypatch.setattr(app_module, 'scrape_tweet', scrape_tweet)
+    client.get('/', headers=headers)
+    faults.down = True
+    client.post('/add_tweet', headers=headers, data={
+        'tweet_url': 'https://x.com/author/status/2', 'category_id': 'category-0'})
+    assert len(app_module.write_queue) == 1
+
+    faults.down = False
+    time.sleep(RESET_TIMEOUT)
+    client.get('/', headers=headers)
+    wait_for_replay(app_module)
+
+    assert len(scraped) == 1
+    tweets = [doc.to_dict() for doc in bench_board_collection(app_module.db, 'tweets').stream()]
+    assert 'Queued tweet' in [tweet['tweet_text'] for tweet in tweets]
+    category = bench_board_collection(app_module.db, 'categories').document('category-0').get().to_dict()
+    assert category['version'] == 1